@@ -0,0 +1,214 @@
+"""Local server that answers all crawler requests with fixture data.
+
+Point the crawler at it with the `origins` this returns, e.g.
+
+    server, origins = serve(packages=1000)
+    crawler.get_components(gh_token="x", origins=origins)
+
+Every response is generated deterministically from the package number (see
+synthetic.py), so runs are comparable and nothing needs to be stored in the repo.
+"""
+
+import io
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from benchmarks.synthetic import make_readme, package_name
+
+HOSTS = [
+    "discuss.streamlit.io",
+    "pypi.org",
+    "pypistats.org",
+    "api.github.com",
+    "github.com",
+]
+
+
+def make_image():
+    from PIL import Image
+
+    out = io.BytesIO()
+    frames = [Image.new("RGB", (1200, 800), color) for color in ["red", "blue"]]
+    frames[0].save(out, "GIF", save_all=True, append_images=frames[1:])
+    return out.getvalue()
+
+
+class Fixtures:
+    """All responses for a fake world of `packages` component packages. The simple
+    index also lists `noise` packages per component that aren't components. Repos in
+    `blocked` fail with a FORBIDDEN error in GraphQL and with 451 in the REST API, and
+    the first `rate_limited` GraphQL requests fail with a RATE_LIMITED error (both with
+    status code 200, like Github does)."""
+
+    def __init__(
+        self, packages=1000, noise=20, tracker_size=50, blocked=(), rate_limited=0
+    ):
+        self.packages = [package_name(i) for i in range(packages)]
+        self.noise = noise
+        self.tracker_size = tracker_size
+        self.blocked = set(blocked)
+        self.rate_limited = rate_limited
+        self._image = None
+
+    def number(self, name):
+        m = re.search(r"\d+$", name)
+        return int(m.group()) if m else 0
+
+    def owner(self, package):
+        return f"user{self.number(package) % 97}"
+
+    def tracker(self):
+        items = "".join(
+            f"<li>{p} (by {self.owner(p)}) – A component "
+            f'<a href="https://github.com/{self.owner(p)}/{p}">Github</a> '
+            f'<a href="https://pypi.org/project/{p}/">PyPI</a></li>'
+            for p in self.packages[: self.tracker_size]
+        )
+        return f"<html><body>{'<ul><li>x</li></ul>' * 3}<ul>{items}</ul></body></html>"
+
+    def simple_index(self):
+        names = []
+        for i, p in enumerate(self.packages):
+            names.append(p)
+            names.extend(f"other-package-{i}-{j}" for j in range(self.noise))
+        links = "\n".join(f'    <a href="/simple/{n}/">{n}</a>' for n in names)
+        return f"<!DOCTYPE html>\n<html><body>\n{links}\n</body></html>"
+
+    def pypi_json(self, package):
+        if package not in self.packages:
+            return None
+        owner = self.owner(package)
+        # Every 10th package doesn't link to its repo, so it has to be guessed.
+        linked = self.number(package) % 10 != 0
+        return {
+            "info": {
+                "author": owner,
+                "summary": f"Summary of {package}",
+                "home_page": (
+                    f"https://github.com/{owner}/{package}" if linked else None
+                ),
+                "project_urls": {},
+                "description": "",
+            },
+            "releases": {"0.1.0": [{"upload_time": "2021-06-01T12:00:00"}]},
+        }
+
+    def repo(self, owner, name):
+        """Every 20th package (and all names that aren't packages) has no repo, every
+        3rd repo has no description."""
+        number = self.number(name)
+        if name not in self.packages or number % 20 == 0:
+            return None
+        return {
+            "stargazerCount": number % 500,
+            "description": f"Description of {name}" if number % 3 else None,
+            "createdAt": "2021-05-01T00:00:00Z",
+            "owner": {"avatarUrl": f"https://avatars.githubusercontent.com/{owner}"},
+            "readme0": {"text": make_readme(name, owner)},
+        }
+
+    def image(self):
+        if self._image is None:
+            self._image = make_image()
+        return self._image
+
+
+class Handler(BaseHTTPRequestHandler):
+    fixtures = None
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body, content_type="text/html"):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data):
+        if data is None:
+            return self.send(404, "Not found")
+        self.send(200, json.dumps(data), "application/json")
+
+    def route(self):
+        _, host, path = self.path.split("/", 2)
+        return host, "/" + urlsplit(path).path
+
+    def do_GET(self):
+        host, path = self.route()
+        f = self.fixtures
+        if host == "discuss.streamlit.io":
+            return self.send(200, f.tracker())
+        if host == "pypi.org" and path.startswith("/simple"):
+            return self.send(200, f.simple_index())
+        if host == "pypi.org":
+            m = re.match(r"/pypi/([^/]+)/json", path)
+            return self.send_json(f.pypi_json(m.group(1)) if m else None)
+        if host == "pypistats.org":
+            return self.send_json(
+                {"data": {"last_day": 10, "last_week": 70, "last_month": 300}}
+            )
+        if host == "github.com" and path.endswith(".gif"):
+            return self.send(200, f.image(), "image/gif")
+        if host == "api.github.com":
+            m = re.match(r"/repos/([^/]+)/([^/]+)(/readme)?$", path)
+            if m and m.group(2) in f.blocked:
+                return self.send(451, "Repository access blocked")
+            if m and not m.group(3):
+                repo = f.repo(m.group(1), m.group(2))
+                if repo is None:
+                    return self.send(404, "Not found")
+                return self.send_json(
+                    {
+                        "stargazers_count": repo["stargazerCount"],
+                        "description": repo["description"],
+                        "created_at": repo["createdAt"],
+                        "owner": {"avatar_url": repo["owner"]["avatarUrl"]},
+                    }
+                )
+        self.send(404, "Not found")
+
+    def do_POST(self):
+        host, path = self.route()
+        if host != "api.github.com" or path != "/graphql":
+            return self.send(404, "Not found")
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        f = self.fixtures
+        if f.rate_limited > 0:
+            f.rate_limited -= 1
+            error = {"type": "RATE_LIMITED", "message": "API rate limit exceeded"}
+            return self.send_json({"data": None, "errors": [error]})
+        variables = body["variables"]
+        data = {}
+        errors = []
+        i = 0
+        while f"o{i}" in variables:
+            alias, name = f"r{i}", variables[f"n{i}"]
+            if name in f.blocked:
+                data[alias] = None
+                errors.append(
+                    {"type": "FORBIDDEN", "path": [alias], "message": "Access blocked"}
+                )
+            else:
+                data[alias] = f.repo(variables[f"o{i}"], name)
+                if data[alias] is None:
+                    errors.append(
+                        {"type": "NOT_FOUND", "path": [alias], "message": "Not found"}
+                    )
+            i += 1
+        self.send_json({"data": data, "errors": errors} if errors else {"data": data})
+
+
+def serve(**fixture_kwargs):
+    """Starts the server in a background thread, returns (server, origins)."""
+    handler = type("Handler", (Handler,), {"fixtures": Fixtures(**fixture_kwargs)})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    return server, {f"https://{host}": f"{base}/{host}" for host in HOSTS}
@@ -0,0 +1,173 @@
+"""Benchmarks for the crawl and the query path of the app.
+
+Run from the repo root:
+
+    python -m benchmarks.run                       # everything
+    python -m benchmarks.run --only readme catalog # some benchmarks
+    python -m benchmarks.run --sizes 1000 10000    # smaller catalogs
+
+Each benchmark reports the best of a few repeats in seconds. Results are printed and
+appended to benchmarks/results.jsonl together with the git commit, so changes can be
+compared over time.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import crawler
+from benchmarks import fixture_server
+from benchmarks.synthetic import make_components, make_readme
+from cards import render_grid
+from catalog import Catalog, read_catalog, write_catalog
+from fetch import Fetcher
+from readme import parse_readme
+
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "results.jsonl")
+
+SIZES = [1000, 10000, 100000]
+
+
+def best_of(func, repeat=5):
+    """Returns the fastest of `repeat` runs of `func` in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_crawl(packages):
+    """The whole crawl against the fixture server, without any state or cache."""
+    server, origins = fixture_server.serve(packages=packages)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            return best_of(
+                lambda: crawler.get_components(
+                    gh_token="x",
+                    origins=origins,
+                    thumbnail_dir=os.path.join(tmp, "thumbnails"),
+                    rates={},
+                ),
+                repeat=1,
+            )
+    finally:
+        server.shutdown()
+
+
+def bench_get_all_packages(packages):
+    server, origins = fixture_server.serve(packages=packages)
+
+    async def get_all_packages():
+        async with Fetcher(origins=origins, rates={}) as fetcher:
+            return await crawler.Crawler(fetcher).get_all_packages()
+
+    try:
+        return best_of(lambda: asyncio.run(get_all_packages()), repeat=3)
+    finally:
+        server.shutdown()
+
+
+def bench_parse_readme(n=1000):
+    readmes = [make_readme(f"streamlit-bench-{i}", "user") for i in range(n)]
+    return best_of(lambda: [parse_readme(r, "user", "repo") for r in readmes], 3)
+
+
+def bench_catalog(size):
+    """Building, loading, querying and rendering a catalog with `size` components."""
+    components = make_components(size)
+    results = {"build": best_of(lambda: Catalog.from_components(components), 1)}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog.arrow")
+        write_catalog(components, path)
+        results["load"] = best_of(lambda: read_catalog(path), 3)
+        results["load_search_index"] = best_of(lambda: read_catalog(path).warm_up(), 3)
+        catalog = read_catalog(path)
+        catalog.warm_up()
+
+    newer_than = datetime(2022, 10, 1) - timedelta(days=60)
+    queries = {
+        "sort": lambda: catalog.query("stars")[:60],
+        "filter_category": lambda: catalog.query("downloads", category="charts")[:60],
+        "filter_newer": lambda: catalog.query("stars", newer_than=newer_than)[:4],
+        "search": lambda: catalog.query("stars", search="chart")[:60],
+        "search_two_terms": lambda: catalog.query("stars", "interactive map")[:60],
+        "search_typo": lambda: catalog.query("stars", search="intercative")[:60],
+    }
+    for name, query in queries.items():
+        results[name] = best_of(query)
+    # What the app does for a page of cards.
+    page = catalog.query("stars")[:60]
+    results["render_page"] = best_of(lambda: render_grid(page.cards()))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=["crawl", "index", "readme", "catalog"],
+        help="only run these benchmarks",
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=SIZES, help="catalog sizes"
+    )
+    parser.add_argument(
+        "--packages",
+        type=int,
+        default=500,
+        help="number of component packages on the fixture server",
+    )
+    parser.add_argument(
+        "--no-save", action="store_true", help="don't append to results.jsonl"
+    )
+    args = parser.parse_args()
+    only = set(args.only or ["crawl", "index", "readme", "catalog"])
+
+    results = {}
+    if "crawl" in only:
+        results["crawl"] = bench_crawl(args.packages)
+    if "index" in only:
+        results["get_all_packages"] = bench_get_all_packages(args.packages)
+    if "readme" in only:
+        results["parse_readme_1000"] = bench_parse_readme()
+    if "catalog" in only:
+        for size in args.sizes:
+            results[f"catalog_{size}"] = bench_catalog(size)
+
+    print(json.dumps(results, indent=2))
+    if not args.no_save:
+        with open(RESULTS_PATH, "a") as f:
+            record = {
+                "time": datetime.now().isoformat(),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "packages": args.packages,
+                "results": results,
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Deterministic fake data for the benchmarks: components, READMEs and API responses."""
+
+import random
+from datetime import datetime, timedelta
+
+from crawler import Component
+
+WORDS = (
+    "streamlit component chart table image video map graph editor text widget "
+    "authentication navigation dataframe plot interactive fast simple custom react "
+    "python app dashboard aggrid folium plotly camera audio upload download"
+).split()
+
+CATEGORIES = ["widgets", "charts", "image", "video", "text", "maps", "dataframe"]
+
+README = """<p align="center"><img src="docs/logo.png" width="120"></p>
+
+# {name}
+
+[![PyPI](https://img.shields.io/pypi/v/{package})](https://pypi.org/project/{package}/)
+[![Open in Streamlit](https://static.streamlit.io/badges/streamlit_badge_black_white.svg)](https://share.streamlit.io/{owner}/{package}/main/app.py)
+
+{description}
+
+![Demo](demo.gif)
+
+## Installation
+
+```
+pip install {package}
+```
+
+## Usage
+
+```python
+import streamlit as st
+from {module} import component
+
+component("hello")
+```
+
+{filler}
+"""
+
+
+def sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def package_name(i):
+    prefix = ["streamlit-", "st-", "streamlit_"][i % 3]
+    return f"{prefix}{WORDS[i % len(WORDS)]}-{i}"
+
+
+def make_readme(package, owner, seed=0):
+    rng = random.Random(f"{seed}-{package}")
+    return README.format(
+        name=package.replace("-", " ").title(),
+        package=package,
+        owner=owner,
+        module=package.replace("-", "_"),
+        description=sentence(rng, 20),
+        filler="\n\n".join(sentence(rng, 40) for _ in range(20)),
+    )
+
+
+def make_components(n, seed=0):
+    """Returns `n` components that look like the result of a crawl."""
+    rng = random.Random(seed)
+    start = datetime(2019, 10, 1)
+    components = []
+    for i in range(n):
+        package = package_name(i)
+        owner = f"user{rng.randrange(n // 3 + 1)}"
+        has_github = rng.random() < 0.8
+        components.append(
+            Component(
+                name=package.replace("-", " ").title(),
+                package=package,
+                demo=(
+                    f"https://share.streamlit.io/{owner}/{package}"
+                    if rng.random() < 0.3
+                    else None
+                ),
+                github=f"https://github.com/{owner}/{package}" if has_github else None,
+                pypi=f"https://pypi.org/project/{package}/",
+                image_url=(
+                    f"https://github.com/{owner}/{package}/raw/HEAD/demo.gif"
+                    if rng.random() < 0.6
+                    else None
+                ),
+                stars=int(rng.paretovariate(1.2)) if has_github else None,
+                github_description=sentence(rng, 15) if has_github else None,
+                pypi_description=sentence(rng, 10),
+                avatar=(
+                    f"https://avatars.githubusercontent.com/{owner}"
+                    if has_github
+                    else None
+                ),
+                github_author=owner if has_github else None,
+                pypi_author=owner,
+                created_at=start + timedelta(minutes=rng.randrange(3 * 365 * 24 * 60)),
+                downloads=int(rng.paretovariate(0.8) * 10),
+                categories=rng.sample(CATEGORIES, rng.randrange(3)),
+            )
+        )
+    return components
@@ -0,0 +1,192 @@
+"""Crawls all components and writes a new catalog snapshot.
+
+The app only loads the newest snapshot, so this can run on a schedule (e.g. a cron job
+or CI) without anyone waiting for it:
+
+    GH_TOKEN=... python build_catalog.py
+"""
+
+import argparse
+import contextlib
+import os
+
+from tqdm import tqdm
+
+import crawler
+from catalog import list_snapshots, prune_snapshots, read_table, write_snapshot
+from thumbnails import THUMBNAIL_DIR, ThumbnailStore
+
+SNAPSHOT_DIR = "snapshots"
+
+
+@contextlib.contextmanager
+def spinner(text):
+    print(text)
+    yield
+
+
+def build(
+    gh_token=None,
+    snapshots=SNAPSHOT_DIR,
+    keep=5,
+    state="crawl_state.db",
+    cache="crawl_cache.db",
+    thumbnails=THUMBNAIL_DIR,
+    changelog="crawl_changes.jsonl",
+    report="crawl_reports.jsonl",
+    workers=0,
+    full=False,
+    partial=True,
+    on_snapshot=None,
+    pypi_dump=None,
+    downloads_dump=None,
+    progress=crawler.no_progress,
+    spinner=None,
+    **fetcher_kwargs,
+):
+    """Runs the crawl and writes a snapshot, returns the path of the snapshot. Only
+    fields that are due are refreshed, unless `full` is set (see `scheduler.py`).
+
+    If `partial` is set, partial snapshots are written while the crawl goes on, with
+    fresh data for the most popular components first. Each one replaces the one before,
+    the last one is removed once the full snapshot is written. `on_snapshot` is called
+    with the path of each snapshot (partial or not) right after it's written, before
+    the one it replaces is removed. If the crawl fails, the partial snapshot is removed
+    as well.
+
+    `fetcher_kwargs` are passed on to `fetch.Fetcher`."""
+    partial_paths = []
+
+    def publish(components):
+        path = write_snapshot(components, snapshots)
+        print(f"Wrote partial snapshot {path}")
+        if on_snapshot is not None:
+            on_snapshot(path)
+        for old_path in partial_paths:
+            if old_path != path:
+                os.remove(old_path)
+        partial_paths[:] = [path]
+
+    try:
+        components = crawler.get_components(
+            gh_token=gh_token,
+            pypi_dump=pypi_dump,
+            downloads_dump=downloads_dump,
+            state_path=state,
+            cache_path=cache,
+            thumbnail_dir=thumbnails,
+            changelog=changelog,
+            report_path=report,
+            workers=workers,
+            full=full,
+            publish=publish if partial else None,
+            progress=progress,
+            spinner=spinner,
+            **fetcher_kwargs,
+        )
+    except BaseException:
+        # Otherwise the partial snapshot would be the newest one and look like a fresh
+        # catalog, until the next crawl a day later.
+        for partial_path in partial_paths:
+            os.remove(partial_path)
+        raise
+    path = write_snapshot(components, snapshots)
+    if on_snapshot is not None:
+        on_snapshot(path)
+    for partial_path in partial_paths:
+        if partial_path != path:
+            os.remove(partial_path)
+    prune_snapshots(snapshots, keep)
+    if thumbnails:
+        # Keep the thumbnails of all snapshots that are still around.
+        used = set()
+        for snapshot in list_snapshots(snapshots):
+            used.update(read_table(snapshot)["thumbnail"].to_pylist())
+        ThumbnailStore(thumbnails).prune(used)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--gh-token",
+        default=os.environ.get("GH_TOKEN"),
+        help="Github token (default: $GH_TOKEN)",
+    )
+    parser.add_argument(
+        "--snapshots", default=SNAPSHOT_DIR, help="directory to write snapshots to"
+    )
+    parser.add_argument(
+        "--keep", type=int, default=5, help="number of snapshots to keep"
+    )
+    parser.add_argument(
+        "--state", default="crawl_state.db", help="SQLite file for the crawl state"
+    )
+    parser.add_argument(
+        "--cache",
+        default="crawl_cache.db",
+        help="SQLite file to cache responses in (empty to disable)",
+    )
+    parser.add_argument(
+        "--thumbnails",
+        default=THUMBNAIL_DIR,
+        help="directory to store thumbnails in, served by the app (empty to disable)",
+    )
+    parser.add_argument(
+        "--changelog",
+        default="crawl_changes.jsonl",
+        help="file to append the changes of this crawl to",
+    )
+    parser.add_argument(
+        "--report",
+        default="crawl_reports.jsonl",
+        help="file to append the metrics of this crawl to",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        # One core is left for the main process, which does all the fetching.
+        default=(os.cpu_count() or 1) - 1,
+        help="number of processes for parsing, 0 to parse in the main process",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="refresh all fields, not only the ones that are due",
+    )
+    parser.add_argument(
+        "--no-partial",
+        action="store_true",
+        help="don't write partial snapshots during the crawl",
+    )
+    parser.add_argument(
+        "--pypi-dump", help="JSON lines mirror of the PyPI JSON API to read from"
+    )
+    parser.add_argument(
+        "--downloads-dump",
+        help="CSV or Parquet file with download numbers to read from (e.g. a BigQuery export)",
+    )
+    args = parser.parse_args()
+
+    path = build(
+        gh_token=args.gh_token,
+        snapshots=args.snapshots,
+        keep=args.keep,
+        state=args.state,
+        cache=args.cache,
+        thumbnails=args.thumbnails,
+        changelog=args.changelog,
+        report=args.report,
+        workers=args.workers,
+        full=args.full,
+        partial=not args.no_partial,
+        pypi_dump=args.pypi_dump,
+        downloads_dump=args.downloads_dump,
+        progress=tqdm,
+        spinner=spinner,
+    )
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
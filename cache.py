@@ -0,0 +1,167 @@
+"""Content-addressed cache for HTTP responses.
+
+Bodies are stored zlib-compressed in a SQLite file, keyed by their hash, so identical
+responses (e.g. the same 404 page for many URLs) are only stored once. Each URL points
+to a body and is fresh for the TTL of its source (i.e. host). Fresh responses are
+served without any request, stale ones are revalidated with their ETag/Last-Modified.
+Once the bodies take up more than `max_size` bytes, the least recently used responses
+are evicted.
+
+It doesn't depend on Streamlit, and several processes can share one cache file. App
+replicas should open it with `readonly=True`, so only the crawl writes to it.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from urllib.parse import urlsplit
+
+DAY = 24 * 3600
+
+# Source (host) -> seconds a cached response is used without asking the server again.
+DEFAULT_TTLS = {
+    "discuss.streamlit.io": DAY,
+    "pypi.org": DAY,
+    "pypistats.org": DAY,
+    "api.github.com": DAY,
+    "github.com": 7 * DAY,
+}
+
+# Only store headers we need to revalidate or parse the response.
+STORED_HEADERS = ["content-type", "etag", "last-modified"]
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path="crawl_cache.db",
+        ttls=None,
+        default_ttl=DAY,
+        max_size=500 * 1024**2,
+        readonly=False,
+    ):
+        self.path = path
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.readonly = readonly
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "stored": 0,
+            "evicted": 0,
+        }
+        if readonly:
+            self._db = sqlite3.connect(
+                f"file:{path}?mode=ro", uri=True, isolation_level=None
+            )
+            return
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS bodies (
+                hash TEXT PRIMARY KEY,
+                data BLOB,
+                size INTEGER
+            )""")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status_code INTEGER,
+                headers TEXT,
+                hash TEXT,
+                fetched_at REAL,
+                used_at REAL
+            )""")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)"
+        )
+
+    def close(self):
+        self._db.close()
+
+    def ttl(self, url):
+        return self.ttls.get(urlsplit(url).hostname, self.default_ttl)
+
+    def get(self, url):
+        """Returns (status code, headers, body, fresh) for a cached response, None if
+        there's none. `fresh` is False once the response is older than its TTL."""
+        row = self._db.execute(
+            "SELECT r.status_code, r.headers, r.fetched_at, b.data FROM responses r "
+            "JOIN bodies b ON r.hash = b.hash WHERE r.url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        status_code, headers, fetched_at, data = row
+        if not self.readonly:
+            self._db.execute(
+                "UPDATE responses SET used_at = ? WHERE url = ?", (time.time(), url)
+            )
+        fresh = time.time() - fetched_at < self.ttl(url)
+        return status_code, json.loads(headers), zlib.decompress(data), fresh
+
+    def put(self, url, status_code, headers, body):
+        if self.readonly:
+            return
+        content_hash = hashlib.sha256(body).hexdigest()
+        headers = {k: headers[k] for k in STORED_HEADERS if k in headers}
+        now = time.time()
+        with self._db:
+            self._db.execute("BEGIN")
+            data = zlib.compress(body)
+            self._db.execute(
+                "INSERT OR IGNORE INTO bodies VALUES (?, ?, ?)",
+                (content_hash, data, len(data)),
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (url, status_code, json.dumps(headers), content_hash, now, now),
+            )
+        self.stats["stored"] += 1
+        if self.stats["stored"] % 100 == 0:
+            self.evict()
+
+    def touch(self, url):
+        """Marks a response as fresh again (e.g. after a 304)."""
+        if not self.readonly:
+            self._db.execute(
+                "UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url)
+            )
+
+    def size(self):
+        """Returns the size of all (compressed) bodies in bytes."""
+        (size,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM bodies")
+        return size[0]
+
+    def evict(self):
+        """Removes the least recently used responses until the cache fits in
+        `max_size`, then all bodies no response points to anymore."""
+        if self.readonly or self.max_size is None:
+            return
+        size = self.size()
+        if size <= self.max_size:
+            return
+        with self._db:
+            self._db.execute("BEGIN")
+            rows = self._db.execute(
+                "SELECT r.url, b.size FROM responses r JOIN bodies b ON r.hash = b.hash "
+                "ORDER BY r.used_at"
+            ).fetchall()
+            evicted = []
+            for url, body_size in rows:
+                if size <= self.max_size:
+                    break
+                evicted.append((url,))
+                size -= body_size  # approximate, bodies can be shared
+            self._db.executemany("DELETE FROM responses WHERE url = ?", evicted)
+            self._db.execute(
+                "DELETE FROM bodies WHERE hash NOT IN (SELECT hash FROM responses)"
+            )
+        self.stats["evicted"] += len(evicted)
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"] + self.stats["revalidated"]
+        return (self.stats["hits"] + self.stats["revalidated"]) / total if total else 0
@@ -0,0 +1,192 @@
+"""Renders component cards as plain HTML.
+
+A whole grid of cards is sent to the browser as a single markdown element, instead of
+one `st.columns` / `st.image` / `st.write` / `st.code` call per card. That's one delta
+message per grid instead of ~10 per card, so reruns stay fast no matter how many cards
+are shown.
+"""
+
+import base64
+import dataclasses
+import hashlib
+import json
+from html import escape
+
+from thumbnails import thumbnail_url
+
+# Bump this when the markup of a card changes, so cached cards are rendered again.
+CARD_VERSION = 2
+
+DEFAULT_AVATAR = (
+    "https://icon-library.com/images/default-profile-icon/default-profile-icon-16.jpg"
+)
+
+INSTALL_COMMAND = "pip install"
+
+# Favicons for links, like markdownlit's @(label)(url) mentions.
+FAVICON_URL = "https://www.google.com/s2/favicons?domain={}&sz=32"
+
+CSS = """
+.cards {display: grid; grid-template-columns: repeat(4, minmax(0, 1fr)); gap: 2rem; margin-bottom: 2rem}
+@media (max-width: 992px) {.cards {grid-template-columns: repeat(2, minmax(0, 1fr))}}
+@media (max-width: 576px) {.cards {grid-template-columns: minmax(0, 1fr)}}
+.card-image {display: block; border: 1px solid #D6D6D9; border-radius: 3px; height: 200px; width: 100%; object-fit: cover; background-size: cover; background-position: center; margin-bottom: 1rem}
+.card h4 {padding: 0; margin: 0 0 0.5rem 0}
+.card-author {font-size: 14px; color: rgba(49, 51, 63, 0.6); margin-bottom: 0.5rem}
+.card-author a {color: inherit; text-decoration: inherit}
+.card-author img {border: 1px solid #D6D6D9; width: 20px; height: 20px; border-radius: 50%; vertical-align: middle; margin-right: 0.5rem}
+.card p {margin-bottom: 0.5rem}
+.card pre {background: #F0F2F6; border-radius: 0.25rem; padding: 0.5rem 0.75rem; margin-bottom: 0.5rem; overflow-x: auto}
+.card pre code {background: none; padding: 0; font-size: 14px}
+.card-links a {white-space: nowrap; text-decoration: none}
+.card-links img {width: 16px; height: 16px; vertical-align: text-bottom; margin-right: 0.25rem}
+.skeleton .card-image, .skeleton-line {background: #F0F2F6; border-color: #F0F2F6; animation: skeleton 1.5s ease-in-out infinite}
+.skeleton-line {height: 1rem; border-radius: 3px; margin-bottom: 0.75rem}
+@keyframes skeleton {50% {opacity: 0.5}}
+"""
+
+
+def default_image_css(path="default_image.png"):
+    """CSS that shows the default image for cards without one. It's inlined once per
+    page, so it doesn't need to be served as a file."""
+    with open(path, "rb") as f:
+        data = base64.b64encode(f.read()).decode()
+    return (
+        f".card-image.default {{background-image: url(data:image/png;base64,{data})}}"
+    )
+
+
+def shorten(text, length=100):
+    if len(text) > length:
+        short_text = text[:length]
+
+        # Cut last word if short_text doesn't end on a word.
+        if short_text[-1] != " " and text[length] != " ":
+            short_text = short_text[: short_text.rfind(" ")]
+
+        # Remove whitespace at the end.
+        short_text = short_text.rstrip()
+
+        # Deal with sentence end markers.
+        if short_text[-1] in [".", "!", "?"]:
+            return short_text
+        elif short_text[-1] in [",", ";", ":", "-"]:
+            return short_text[:-1] + "..."
+        else:
+            return short_text + "..."
+    else:
+        return text
+
+
+def text(s):
+    """Escapes text for HTML. Newlines are removed too, a blank line would end the HTML
+    block in markdown."""
+    return escape(" ".join(str(s).split()))
+
+
+def link(label, url, icon=None, domain=None):
+    """A link with an emoji or favicon in front of it."""
+    if domain is not None:
+        icon = f'<img src="{FAVICON_URL.format(domain)}">'
+    return f'<a href="{escape(url)}" target="_blank">{icon or ""}{escape(label)}</a>'
+
+
+def render_card(c):
+    """Returns the HTML for a single component card."""
+    parts = ['<div class="card">']
+
+    if c.thumbnail is not None:
+        src = thumbnail_url(c.thumbnail)
+    else:
+        src = c.image_url
+    if src is not None:
+        parts.append(f'<img class="card-image" src="{escape(src)}" loading="lazy">')
+    else:
+        parts.append('<div class="card-image default"></div>')
+
+    title = text(c.name)
+    if c.stars:
+        title += f" ({c.stars} ⭐️)"
+    parts.append(f"<h4>{title}</h4>")
+
+    avatar = escape(c.avatar or DEFAULT_AVATAR)
+    if c.github_author and c.avatar:
+        url = escape(f"https://github.com/{c.github_author}")
+        author = text(c.github_author)
+    elif c.pypi_author:
+        url = escape(c.pypi)
+        author = text(c.pypi_author)
+    else:
+        url = None
+    if url:
+        parts.append(
+            f'<div class="card-author"><a href="{url}"><img src="{avatar}"></a>'
+            f'<a href="{url}">{author}</a></div>'
+        )
+
+    if c.github_description:
+        parts.append(f"<p>{text(shorten(c.github_description))}</p>")
+    elif c.pypi_description:
+        parts.append(f"<p>{text(c.pypi_description)}</p>")
+    if c.package:
+        parts.append(f"<pre><code>{INSTALL_COMMAND} {escape(c.package)}</code></pre>")
+
+    links = []
+    if c.github:
+        links.append(link("GitHub", c.github, domain="github.com"))
+    if c.demo:
+        links.append(link("Demo", c.demo, icon="🎈 "))
+    if c.forum_post:
+        links.append(link("Forum", c.forum_post, domain="streamlit.io"))
+    if c.pypi:
+        links.append(link("PyPI", c.pypi, icon="📦 "))
+    parts.append(f'<div class="card-links">{" &nbsp;•&nbsp; ".join(links)}</div>')
+
+    parts.append("</div>")
+    return "".join(parts)
+
+
+# Gray placeholder with the rough shape of a card, shown while the catalog loads.
+SKELETON_CARD = (
+    '<div class="card skeleton"><div class="card-image"></div>'
+    '<div class="skeleton-line" style="width: 60%"></div>'
+    '<div class="skeleton-line" style="width: 40%"></div>'
+    '<div class="skeleton-line"></div><div class="skeleton-line" style="width: 80%"></div>'
+    "</div>"
+)
+
+# Content hash -> card HTML, so a new catalog only renders cards that changed.
+_rendered = {}
+
+
+def content_hash(c):
+    """Hash of everything in a component (and the card version)."""
+    data = json.dumps([CARD_VERSION, dataclasses.astuple(c)], default=str)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+def render_cards(components):
+    """Returns the HTML of each component's card, reusing cards rendered before if the
+    component didn't change."""
+    global _rendered
+    rendered = {}
+    cards = []
+    for c in components:
+        key = content_hash(c)
+        if key not in rendered:
+            rendered[key] = _rendered.get(key) or render_card(c)
+        cards.append(rendered[key])
+    # Only keep the cards of the newest catalog, so this doesn't grow forever.
+    _rendered = rendered
+    return cards
+
+
+def render_skeleton(n):
+    """Returns the HTML for a grid of `n` placeholder cards."""
+    return render_grid([SKELETON_CARD] * n)
+
+
+def render_grid(cards):
+    """Returns the HTML for a grid of rendered cards. It's on a single line, so
+    markdown doesn't mistake any of it for a code block or paragraph."""
+    return f'<div class="cards">{"".join(cards)}</div>'
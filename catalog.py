@@ -0,0 +1,305 @@
+"""All components of a crawl, prepared for fast queries.
+
+Components are stored column by column in an Arrow table, with author and category
+strings dictionary-encoded (i.e. interned). On disk, the table is an uncompressed Arrow
+IPC file, which `read_catalog` memory-maps without copying, so many server processes can
+share one catalog through the page cache and load it almost instantly.
+
+`Catalog` precomputes everything the app needs on every rerun: the order of components
+for each sorting, a bitset of members for each category, the components sorted by
+creation date (for the "Newcomers" row), and the search index. The search index takes
+almost all of the loading time, so it's built separately with `warm_up` (or on the
+first search). The HTML of each card
+is rendered once when the catalog is built and stored in the table. A query is then
+just an intersection of bitsets and a slice, and the app only reads the cards of the
+components that are actually shown.
+"""
+
+import dataclasses
+import glob
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from cards import render_cards
+from crawler import Component
+from search import FIELD_BOOSTS, SearchIndex, tokenize
+
+# Bump this when the schema changes in a way old snapshots can't be read anymore.
+CATALOG_VERSION = 5
+
+# String columns with few distinct values, stored dictionary-encoded.
+INTERNED_FIELDS = ["github_author", "pypi_author"]
+
+# Sorting -> column to sort by (descending). Components with an image come first if
+# they're tied.
+SORT_COLUMNS = {
+    "stars": "stars",
+    "downloads": "downloads",
+    # created_at comes from Github, or from the first upload to PyPI if there's no
+    # Github repo.
+    "newest": "created_at",
+}
+
+
+def arrow_type(field):
+    if field.name in INTERNED_FIELDS:
+        return pa.dictionary(pa.int32(), pa.string())
+    elif field.name == "categories":
+        return pa.list_(pa.dictionary(pa.int32(), pa.string()))
+    elif field.type is int:
+        return pa.int64()
+    elif field.type is datetime:
+        return pa.timestamp("us")
+    return pa.string()
+
+
+# Besides the components' fields, the catalog stores the HTML of each card (see
+# cards.py), so the app doesn't have to render them on every rerun.
+SCHEMA = pa.schema(
+    [pa.field(f.name, arrow_type(f)) for f in dataclasses.fields(Component)]
+    + [pa.field("card", pa.string())],
+    metadata={"catalog_version": str(CATALOG_VERSION)},
+)
+
+
+def to_table(components):
+    """Converts a list of components to an Arrow table."""
+    columns = []
+    for field in SCHEMA:
+        if field.name == "card":
+            columns.append(pa.array(render_cards(components), pa.string()))
+            continue
+        values = [getattr(c, field.name) for c in components]
+        if pa.types.is_dictionary(field.type):
+            column = pa.array(values, pa.string()).dictionary_encode()
+        elif pa.types.is_list(field.type):
+            offsets = [0]
+            for categories in values:
+                offsets.append(offsets[-1] + len(categories or []))
+            flat = pa.array(
+                [category for categories in values for category in categories or []],
+                pa.string(),
+            ).dictionary_encode()
+            column = pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), flat)
+        else:
+            column = pa.array(values, field.type)
+        columns.append(column)
+    return pa.Table.from_arrays(columns, schema=SCHEMA)
+
+
+def write_catalog(components, path):
+    """Writes components to an Arrow IPC file. The file is replaced atomically, so
+    processes that are reading the old one aren't affected."""
+    table = to_table(components)
+    tmp_path = f"{path}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_catalog(path):
+    """Memory-maps a catalog file written by `write_catalog`."""
+    return Catalog(read_table(path))
+
+
+def read_table(path):
+    """Memory-maps the Arrow table of a catalog file."""
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    version = (table.schema.metadata or {}).get(b"catalog_version", b"0").decode()
+    if version != str(CATALOG_VERSION):
+        raise ValueError(
+            f"Catalog {path} has version {version}, expected {CATALOG_VERSION}"
+        )
+    return table
+
+
+def write_snapshot(components, directory, keep=None):
+    """Writes components to a new, timestamped snapshot in `directory` and returns its
+    path. If `keep` is given, only the newest `keep` snapshots are kept."""
+    os.makedirs(directory, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, f"catalog-v{CATALOG_VERSION}-{timestamp}.arrow")
+    write_catalog(components, path)
+    if keep is not None:
+        prune_snapshots(directory, keep)
+    return path
+
+
+def prune_snapshots(directory, keep):
+    """Removes all but the newest `keep` snapshots."""
+    for old_path in list_snapshots(directory)[:-keep]:
+        os.remove(old_path)
+
+
+def list_snapshots(directory):
+    """Returns the paths of all snapshots with the current version, oldest first."""
+    return sorted(
+        glob.glob(os.path.join(directory, f"catalog-v{CATALOG_VERSION}-*.arrow"))
+    )
+
+
+def latest_snapshot(directory):
+    """Returns the path of the newest snapshot in `directory` or None."""
+    snapshots = list_snapshots(directory)
+    return snapshots[-1] if snapshots else None
+
+
+def to_mask(indices, size):
+    """Returns a bitset (as int) with the bits at `indices` set."""
+    b = bytearray((size + 7) // 8)
+    for i in indices:
+        b[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(b, "little")
+
+
+def iter_bits(mask):
+    """Yields the indices of all set bits in a bitset."""
+    bits = bin(mask)[:1:-1]  # reversed, so bit i is at position i
+    i = bits.find("1")
+    while i != -1:
+        yield i
+        i = bits.find("1", i + 1)
+
+
+class Catalog:
+    def __init__(self, table):
+        self.table = table
+        self._all = (1 << len(table)) - 1
+
+        # For each sorting, the component indices in that order and the position of
+        # each component in it. Arrow's sort is stable, so ties keep the crawl order.
+        has_image = pc.is_valid(table["image_url"])
+        self.orders = {}
+        self.ranks = {}
+        for by, column in SORT_COLUMNS.items():
+            values = table[column]
+            if pa.types.is_timestamp(values.type):
+                default = pa.scalar(datetime(1970, 1, 1), values.type)
+            else:
+                default = pa.scalar(0, values.type)
+            order = pc.sort_indices(
+                pa.table({"value": pc.fill_null(values, default), "image": has_image}),
+                sort_keys=[("value", "descending"), ("image", "descending")],
+            )
+            order = array("l", order.to_pylist())
+            rank = array("l", [0]) * len(order)
+            for position, i in enumerate(order):
+                rank[i] = position
+            self.orders[by] = order
+            self.ranks[by] = rank
+
+        category_members = {}
+        for i, categories in enumerate(table["categories"].to_pylist()):
+            for category in categories or []:
+                category_members.setdefault(category, []).append(i)
+        self.category_masks = {
+            category: to_mask(members, len(table))
+            for category, members in category_members.items()
+        }
+
+        dated = sorted(
+            (created_at, i)
+            for i, created_at in enumerate(table["created_at"].to_pylist())
+            if created_at
+        )
+        self._created_at = [created_at for created_at, _ in dated]
+        self._by_created_at = array("l", [i for _, i in dated])
+
+        self._search_index = None
+        self._search_index_lock = threading.Lock()
+
+    @classmethod
+    def from_components(cls, components):
+        return cls(to_table(components))
+
+    def __len__(self):
+        return len(self.table)
+
+    @property
+    def search_index(self):
+        return self.warm_up()
+
+    def warm_up(self, cancelled=None):
+        """Builds the search index if it's not built yet and returns it. Raises
+        `search.Cancelled` if `cancelled()` returns True in the meantime."""
+        # Sessions might search while the refresh thread builds it, only build it once.
+        if self._search_index is None:
+            with self._search_index_lock:
+                if self._search_index is None:
+                    self._search_index = SearchIndex(
+                        {
+                            field: self.table[field].to_pylist()
+                            for field in FIELD_BOOSTS
+                        },
+                        cancelled,
+                    )
+        return self._search_index
+
+    def materialize(self, indices):
+        """Returns the components at `indices` as `Component` objects."""
+        rows = self.table.take(pa.array(indices, pa.int64())).drop(["card"])
+        return [Component(**row) for row in rows.to_pylist()]
+
+    def cards(self, indices):
+        """Returns the rendered cards of the components at `indices`."""
+        return self.table["card"].take(pa.array(indices, pa.int64())).to_pylist()
+
+    def query(self, by, search=None, category=None, newer_than=None):
+        """Returns the components sorted by `by` (see `SORT_COLUMNS`) that match all
+        given filters, as a lazy `CatalogView`. If there's a search term, best matches
+        come first."""
+        order = self.orders[by]
+        if search and not tokenize(search):
+            search = None  # e.g. only punctuation, which would match nothing
+        if not search and not category and not newer_than:
+            return CatalogView(self, order)
+
+        mask = self._all
+        if category:
+            mask &= self.category_masks.get(category, 0)
+        if newer_than:
+            start = bisect_left(self._created_at, newer_than)
+            mask &= to_mask(self._by_created_at[start:], len(self))
+        scores = None
+        if search:
+            scores = self.search_index.search(search)
+            mask &= to_mask(scores, len(self))
+
+        rank = self.ranks[by]
+        if scores:
+            sort_key = lambda i: (-scores[i], rank[i])
+        else:
+            sort_key = rank.__getitem__
+        return CatalogView(self, sorted(iter_bits(mask), key=sort_key))
+
+
+class CatalogView(Sequence):
+    """A list of components in a catalog, which are only turned into `Component`
+    objects when they're accessed."""
+
+    def __init__(self, catalog, indices):
+        self.catalog = catalog
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return CatalogView(self.catalog, self.indices[item])
+        return self.catalog.materialize([self.indices[item]])[0]
+
+    def __iter__(self):
+        return iter(self.catalog.materialize(self.indices))
+
+    def cards(self):
+        return self.catalog.cards(self.indices)
@@ -0,0 +1,690 @@
+"""Crawls Streamlit components from the forum tracker, PyPI, Github, and pypistats.
+
+This doesn't depend on Streamlit, so it can run outside of the app (e.g. against a
+local stub server, see `origins` in `fetch.Fetcher`). All requests of a step run
+concurrently, limits and rates are handled by `fetch.Fetcher`.
+"""
+
+import asyncio
+import contextlib
+import html
+import re
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import List
+
+import httpx
+import yaml
+from bs4 import BeautifulSoup
+
+from cache import ResponseCache
+from downloads import Downloads, DownloadsDumpSource, PypistatsSource
+from fetch import Fetcher
+from metrics import log_report
+from parsing import HTML_PARSER, ParsePool
+from github import GraphQLSource, RESTSource, parse_repo
+from readme import parse_readme
+from repos import RepoResolver
+from scheduler import (
+    FIELD_GROUPS,
+    Scheduler,
+    fill_fields,
+    priority_chunks,
+    priority_order,
+)
+from sources import PyPIDumpSource, PyPIJSONSource
+from state import CrawlState, component_key, diff_components, log_changes
+from thumbnails import INVALID_IMAGE_ERRORS, ThumbnailStore, make_thumbnail
+
+EXCLUDE = [
+    "streamlit",
+    "streamlit-nightly",
+    "repl-streamlit",
+    "streamlit-with-ssl",
+    "streamlit-fesion",
+    "streamlit-aggrid-pro",
+    "st-dbscan",
+    "st-kickoff",
+    "st-undetected-chromedriver",
+    "st-package-reviewer",
+    "streamlit-webcam-example",
+    "st-pyv8",
+    "streamlit-extras-arnaudmiribel",
+    "st-schema-python",
+    "st-optics",
+    "st-spin",
+    "st-dataprovider",
+    "st-microservice",
+    "st_nester",
+    "st-jsme",
+    "st-parsetree",
+    "st-git-hooks",
+    "st-schema",
+    "st-distributions",
+    "st-common-data",
+    "awesome-streamlit",
+    "awesome-streamlit-master",
+    "extra-streamlit-components-SEM",
+    "barfi",
+    "streamlit-plotly-events-retro",
+    "pollination-streamlit-io",
+    "pollination-streamlit-viewer",
+    "st-clustering",
+    "streamlit-text-rating-component",
+    "custom-streamlit",
+    "hf-streamlit",
+]
+
+TRACKER = "https://discuss.streamlit.io/t/streamlit-components-community-tracker/4634"
+
+
+@dataclass
+class Component:
+    name: str = None
+    package: str = None
+    demo: str = None
+    forum_post: str = None
+    github: str = None
+    pypi: str = None
+    image_url: str = None
+    # screenshot_url: str = None
+    stars: int = None
+    github_description: str = None
+    pypi_description: str = None
+    avatar: str = None
+    github_author: str = None
+    pypi_author: str = None
+    created_at: datetime = None
+    downloads: int = None
+    categories: List[str] = None
+    uploaded_at: datetime = None
+    downloads_last_day: int = None
+    downloads_last_week: int = None
+    thumbnail: str = None  # file name in thumbnails.ThumbnailStore
+
+
+def no_progress(iterable, desc=None, total=None):
+    return iterable
+
+
+def is_candidate(package):
+    """Checks if a package name on PyPI looks like a Streamlit component."""
+    return (
+        "streamlit" in package or package.startswith("st-") or package.startswith("st_")
+    ) and package not in EXCLUDE
+
+
+class SimpleIndexParser:
+    """Incrementally extracts package names from the HTML of PyPI's simple index.
+
+    The index has 600k+ links, so instead of building a soup of the whole page, feed it
+    chunk by chunk and only keep the names that pass `keep`.
+    """
+
+    ANCHOR = re.compile(r"<a\b[^>]*>([^<]*)</a>")
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.packages = []
+        self._buffer = ""
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        end = 0
+        for match in self.ANCHOR.finditer(self._buffer):
+            name = html.unescape(match.group(1)).strip()
+            if self.keep(name):
+                self.packages.append(name)
+            end = match.end()
+        # Only keep the beginning of an anchor that's cut off at the end of the chunk.
+        rest = self._buffer[end:]
+        start = rest.rfind("<a")
+        if start == -1:
+            start = rest.rfind("<")
+        self._buffer = rest[start:] if start != -1 else ""
+
+    def close(self):
+        return self.packages
+
+
+def parse_tracker(text):
+    """get all components listed in the forum tracker"""
+    soup = BeautifulSoup(text, HTML_PARSER)
+    lis = soup.find_all("ul")[3].find_all("li")
+
+    components = []
+    for li in lis:
+        c = Component()
+        name = re.sub("\(.*?\)", "", li.text)
+        name = name.split(" – ")[0]
+        name = name.strip()
+        c.name = name
+
+        links = [a.get("href") for a in li.find_all("a")]
+        for l in links:
+            if l.startswith("https://github.com"):
+                c.github = l
+            elif l.startswith("https://share.streamlit.io") or "streamlitapp.com" in l:
+                c.demo = l
+            elif l.startswith("https://discuss.streamlit.io"):
+                c.forum_post = l
+            elif l.startswith("https://pypi.org"):
+                c.pypi = l
+                c.package = re.match("https://pypi.org/project/(.*?)/", l).group(1)
+        components.append(c)
+    return components
+
+
+def format_name(package):
+    """Set names based on PyPI package names."""
+    name = package
+    if name.startswith("st-") or name.startswith("st_"):  # only do at start
+        name = name[3:]
+    return (
+        name.replace("streamlit", "")
+        .replace("--", " ")
+        .replace("-", " ")
+        .replace("__", " ")
+        .replace("_", " ")
+        .strip()
+        .title()
+        .replace("Nlu", "NLU")  # special case adjustments for top results ;)
+        .replace(" Cli", " CLI")
+        .replace("rtc", "RTC")
+        .replace("Hiplot", "HiPlot")
+        .replace("Spacy", "SpaCy")
+        .replace("Aggrid", "AgGrid")
+        .replace("Echarts", "ECharts")
+        .replace("Ui", "UI")
+    )
+
+
+class Crawler:
+    """Runs all crawl steps on a shared `Fetcher`.
+
+    `metadata` is the source for PyPI metadata (see `sources.py`), defaults to the PyPI
+    JSON API. `github` is the source for Github repo data (see `github.py`), defaults to
+    the GraphQL API if there's a token. `downloads` is the source for download numbers
+    (see `downloads.py`), defaults to the pypistats API. If `thumbnails` (a
+    `thumbnails.ThumbnailStore`) is given, thumbnails of the preview images are stored
+    in it. If the fetcher has a crawl state, the changes compared to the last run are
+    stored in `changes` after crawling and appended to the `changelog` file (if given).
+    The report of the crawl's metrics (see `metrics.py`) is stored in `report` and
+    appended to the `report_path` file (if given). With a crawl state, only fields that
+    are due are refreshed and the others are kept from the last run (see
+    `scheduler.py`), unless `full` is set. Step 4 goes through the components most
+    popular first, and if `publish` is given, it's called with a partial list of all
+    components after each chunk. `progress` wraps iterables to show
+    progress (e.g. `stqdm` or `tqdm`), `spinner` is a context manager factory used for
+    steps that have no progress (e.g. `st.spinner`).
+    """
+
+    def __init__(
+        self,
+        fetcher,
+        gh_token=None,
+        metadata=None,
+        github=None,
+        downloads=None,
+        thumbnails=None,
+        changelog=None,
+        report_path=None,
+        full=False,
+        publish=None,
+        progress=no_progress,
+        spinner=None,
+    ):
+        self.fetcher = fetcher
+        self.gh_token = gh_token
+        self.metadata = metadata or PyPIJSONSource(fetcher)
+        if github is None:
+            # The GraphQL API only works with a token.
+            if gh_token:
+                github = GraphQLSource(fetcher, gh_token)
+            else:
+                github = RESTSource(fetcher)
+        self.github = github
+        self.downloads = downloads or PypistatsSource(fetcher)
+        self.readmes = RESTSource(fetcher, gh_token)
+        self.thumbnails = thumbnails
+        self.changelog = changelog
+        self.report_path = report_path
+        self.full = full
+        self.publish = publish
+        self.progress = progress
+        self.spinner = spinner or (lambda text: contextlib.nullcontext())
+        self.changes = None
+        self.report = None
+        self._pypi_infos = {}
+        self._repo_infos = {}
+        self.repos = RepoResolver(self.get_repo_infos, fetcher.state)
+        self.scheduler = Scheduler(fetcher.state) if fetcher.state is not None else None
+        self.previous = {}  # components of the last run, by key
+        self.due = {}  # component key -> groups of fields to refresh
+
+    async def gather(self, coros, desc):
+        """Runs coroutines concurrently while showing progress, returns results in
+        order."""
+        tasks = [asyncio.ensure_future(coro) for coro in coros]
+        try:
+            for future in self.progress(
+                asyncio.as_completed(tasks), desc=desc, total=len(tasks)
+            ):
+                await future
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return [task.result() for task in tasks]
+
+    async def get_all_packages(self):
+        """get all packages on PyPI that look like components"""
+        return await self.fetcher.get_parsed_stream(
+            "https://pypi.org/simple/", SimpleIndexParser(is_candidate)
+        )
+
+    async def get_readme(self, c):
+        """Returns image url, description and demo link from the README of the
+        component's repo. GraphQL already fetched it along with the repo details, only
+        READMEs with unusual names (or without a token) need an extra request."""
+        repo = parse_repo(c.github)
+        if repo is None:
+            return None, None, None
+        info = self._repo_infos.get(repo)
+        if info is not None and info.readme is not None:
+            text, name = info.readme, info.readme_name
+        else:
+            try:
+                text, name = await self.readmes.get_readme(*repo)
+            except (RuntimeError, httpx.HTTPError):
+                # E.g. repos blocked for legal reasons (451), don't fail the whole crawl.
+                return None, None, None
+            if text is None:
+                return None, None, None
+        return await self.fetcher.parse(parse_readme, text, *repo, name=name)
+
+    async def get_thumbnail(self, c):
+        """Downloads the preview image and stores a thumbnail of it. With a crawl
+        state, unchanged images aren't processed again."""
+
+        async def parse(response):
+            if response.status_code != 200:
+                return None
+            name = self.thumbnails.name(response.content)
+            if not self.thumbnails.exists(name):
+                try:
+                    thumbnail = await self.fetcher.parse(
+                        make_thumbnail, response.content
+                    )
+                except INVALID_IMAGE_ERRORS:
+                    return None
+                self.thumbnails.write(name, thumbnail)
+            return name
+
+        try:
+            c.thumbnail = await self.fetcher.get_parsed(c.image_url, parse)
+            if c.thumbnail is not None and not self.thumbnails.exists(c.thumbnail):
+                # Parsed result is from an earlier crawl, but the file is gone.
+                c.thumbnail = await parse(
+                    await self.fetcher.request("GET", c.image_url)
+                )
+        except httpx.HTTPError:
+            c.thumbnail = None
+
+    async def find_package_for_repo(self, c):
+        """Checks if there's a PyPI package with the same name as the Github repo."""
+        repo_name = (
+            c.github.replace("https://", "").replace("http://", "").split("/")[2]
+        )
+        if await self.get_pypi_info(repo_name) is not None:
+            c.package = repo_name
+            c.pypi = f"https://pypi.org/project/{repo_name}/"
+
+    async def get_pypi_info(self, package):
+        # Step 1 and 3 can ask for the same package, so only fetch it once.
+        if package not in self._pypi_infos:
+            self._pypi_infos[package] = await self.metadata.get(package)
+        return self._pypi_infos[package]
+
+    async def get_repo_infos(self, repos):
+        """Gets `github.RepoInfo`s for (owner, repo) tuples in batches. Repos that don't
+        exist are None, repos we couldn't get are missing."""
+        missing = [repo for repo in repos if repo not in self._repo_infos]
+        if missing:
+            self._repo_infos.update(await self.github.get_repos(missing))
+        return {
+            repo: self._repo_infos[repo] for repo in repos if repo in self._repo_infos
+        }
+
+    async def find_github_repos(self, components):
+        """Finds the Github repos of components from PyPI (see `repos.py`)."""
+        packages = {}
+        for c in components:
+            info = self._pypi_infos.get(c.package)
+            packages[c.package] = (c.pypi_author, info.github_links if info else None)
+        repos = await self.repos.resolve(packages)
+        for c in components:
+            c.github = repos.get(c.package)
+
+    async def get_github_infos(self, components):
+        """Get stars, description, avatar and creation date from Github."""
+        components = [c for c in components if parse_repo(c.github)]
+        repos = [parse_repo(c.github) for c in components]
+        infos = await self.get_repo_infos(repos)
+        for c, repo in zip(components, repos):
+            c.github_author = repo[0]
+            info = infos.get(repo)
+            if info is not None:
+                c.stars = info.stars
+                # Without a Github description, we show the README's first paragraph.
+                # That's only fetched again if the README is due, so keep it until then.
+                if info.description or self.is_due(c, "readme"):
+                    c.github_description = info.description
+                c.avatar = info.avatar
+                c.created_at = info.created_at
+
+    def is_due(self, c, group):
+        return group in self.due.get(component_key(c), FIELD_GROUPS)
+
+    def is_known(self, package):
+        """If we can keep the component of a package from the last run, i.e. it's not
+        due for new metadata."""
+        return package in self.previous and not (
+            self.full
+            or self.scheduler is None
+            or self.scheduler.is_due(package, "static")
+        )
+
+    def schedule(self, components):
+        """Decides which groups of fields to refresh for each component, and fills the
+        others in from the last run."""
+        for c in components:
+            key = component_key(c)
+            previous = self.previous.get(key)
+            if previous is None or self.full or self.scheduler is None:
+                self.due[key] = set(FIELD_GROUPS)
+            else:
+                self.due[key] = self.scheduler.due_groups(key)
+                fill_fields(c, previous, FIELD_GROUPS.keys() - self.due[key])
+
+    async def enrich(self, c, readme=True):
+        """Enrich info of a component by reading the README (if `readme`)."""
+        if c.github and readme:
+            # this can also return None!
+            c.image_url, readme_description, demo_url = await self.get_readme(c)
+            if not c.github_description and readme_description:
+                c.github_description = readme_description
+            if not c.demo and demo_url:
+                c.demo = demo_url
+
+        # TODO: If I go with this, I should not even fetch the names from the forum post
+        # above.
+        if c.package:
+            c.name = format_name(c.package)
+
+        # Components without a Github repo get the date of their first PyPI release.
+        if c.created_at is None:
+            c.created_at = c.uploaded_at
+
+    async def enrich_components(self, components):
+        """Runs all of step 4 for some components, only fetches fields that are due."""
+        stage = self.fetcher.metrics.stage
+        with self.spinner("👾 Getting repo details from Github (step 4/5)"), stage(
+            "github_repos"
+        ):
+            await self.find_github_repos(
+                [
+                    c
+                    for c in components
+                    if not c.github and c.package and self.is_due(c, "static")
+                ]
+            )
+            await self.get_github_infos(
+                [
+                    c
+                    for c in components
+                    if c.github and (self.is_due(c, "hot") or self.is_due(c, "static"))
+                ]
+            )
+        with stage("readmes"):
+            await self.gather(
+                [self.enrich(c, readme=self.is_due(c, "readme")) for c in components],
+                desc="👾 Crawling Github (step 4/5)",
+            )
+        with self.spinner("📈 Getting download numbers (step 4/5)"), stage("downloads"):
+            components_with_package = [
+                c for c in components if c.package and self.is_due(c, "hot")
+            ]
+            downloads = await self.downloads.get_downloads(
+                [c.package for c in components_with_package]
+            )
+            for c in components_with_package:
+                d = downloads.get(c.package) or Downloads()
+                c.downloads = d.last_month
+                c.downloads_last_week = d.last_week
+                c.downloads_last_day = d.last_day
+        if self.thumbnails is not None:
+            with stage("thumbnails"):
+                await self.gather(
+                    [
+                        self.get_thumbnail(c)
+                        for c in components
+                        if c.image_url and self.is_due(c, "readme")
+                    ],
+                    desc="🖼️ Making thumbnails (step 4/5)",
+                )
+
+    def partial_components(self, components, pending):
+        """All components for a partial catalog, the ones whose keys are in `pending`
+        (i.e. not enriched yet) as they were in the last run."""
+        result = []
+        for c in components:
+            previous = self.previous.get(component_key(c))
+            if previous is not None:
+                c = replace(c)
+                if component_key(c) in pending:
+                    fill_fields(c, previous, FIELD_GROUPS)
+                # Categories are only added in step 5.
+                if c.categories is None:
+                    c.categories = previous.categories
+            result.append(c)
+        return result
+
+    async def crawl(self, additional_data_path="additional_data.yaml"):
+        components_dict = {}
+        stage = self.fetcher.metrics.stage
+        state = self.fetcher.state
+        if state is not None:
+            self.previous = state.load_components()
+
+        # Step 1: Get components from tracker
+        async def parse(response):
+            if response.status_code != 200:
+                raise RuntimeError(
+                    f"Could not access components tracker, status code {response.status_code}"
+                )
+            return await self.fetcher.parse(parse_tracker, response.text)
+
+        with stage("forum"):
+            tracker_components = await self.fetcher.get_parsed(TRACKER, parse)
+            await self.gather(
+                [
+                    self.find_package_for_repo(c)
+                    for c in tracker_components
+                    if c.github and not c.package
+                ],
+                desc="🎈 Crawling Streamlit forum (step 1/5)",
+            )
+        for c in tracker_components:
+            if c.package:
+                components_dict[c.package] = c
+            else:
+                components_dict[c.name] = c
+
+        # Step 2: Download PyPI index
+        with self.spinner("⬇️ Downloading PyPI index (step 2/5)"), stage("pypi_index"):
+            packages = await self.get_all_packages()
+
+        # Step 3: Search through PyPI packages. Components from the last run that aren't
+        # due for new metadata are kept as they are.
+        for p in packages:
+            if self.is_known(p) and p not in components_dict:
+                components_dict[p] = replace(self.previous[p])
+        packages = [p for p in packages if not self.is_known(p)]
+        with stage("pypi_metadata"):
+            pypi_infos = await self.gather(
+                [self.get_pypi_info(p) for p in packages],
+                desc="📦 Crawling PyPI (step 3/5)",
+            )
+        for p, info in zip(packages, pypi_infos):
+            if info is None:
+                continue
+            if p not in components_dict:
+                components_dict[p] = Component(name=p)
+            c = components_dict[p]
+
+            if not c.package:
+                c.package = p
+            if not c.pypi:
+                c.pypi = f"https://pypi.org/project/{p}/"
+            if not c.pypi_author:
+                c.pypi_author = info.author
+            if info.description:
+                c.pypi_description = info.description
+            c.uploaded_at = info.uploaded_at
+
+        # Step 4: Enrich info of components found above by reading data from Github.
+        # Only fields that are due are fetched. Components at the top of the app go
+        # first, in chunks, and a partial catalog is published after each chunk.
+        self.schedule(components_dict.values())
+        components = list(components_dict.values())
+        pending = {component_key(c) for c in components}
+        chunks = list(priority_chunks(priority_order(components, self.previous)))
+        for i, chunk in enumerate(chunks):
+            await self.enrich_components(chunk)
+            pending.difference_update(component_key(c) for c in chunk)
+            if self.publish is not None and i < len(chunks) - 1:
+                self.publish(self.partial_components(components, pending))
+
+        # Step 5: Enrich with additional data that was manually curated in
+        # additional_data.yaml (currently only categories).
+        with open(additional_data_path) as f:
+            additional_data = yaml.safe_load(f)
+        for c in self.progress(
+            components_dict.values(),
+            desc="🖐 Enriching with manually collected data (step 5/5)",
+        ):
+            # TODO: Need to do this better. Maybe just store pypi name instead of entire url.
+            if c.pypi and c.pypi.split("/")[-2] in additional_data:
+                c.categories = additional_data[c.pypi.split("/")[-2]]["categories"]
+            else:
+                c.categories = []
+
+        components = list(components_dict.values())
+        if state is not None:
+            self.changes = diff_components(self.previous, components)
+            state.save_components(components)
+            self.scheduler.done(self.due)
+            if self.changelog:
+                log_changes(self.changes, self.changelog)
+            print(
+                f"crawl done, {len(self.changes['added'])} added, "
+                f"{len(self.changes['removed'])} removed, "
+                f"{len(self.changes['changed'])} changed"
+            )
+        due = {
+            group: sum(group in groups for groups in self.due.values())
+            for group in FIELD_GROUPS
+        }
+        print(
+            "refreshed "
+            + ", ".join(f"{group} fields of {n}" for group, n in due.items())
+            + f" of {len(components)} components"
+        )
+        stats = self.repos.stats
+        print(
+            f"github repos: {stats['known']} known, {stats['found']} found, "
+            f"{stats['not_found']} not found, {stats['skipped']} skipped (none last time)"
+        )
+        cache = self.fetcher.cache
+        if cache is not None:
+            print(
+                f"response cache: {cache.stats['hits']} hits, "
+                f"{cache.stats['revalidated']} revalidated, "
+                f"{cache.stats['misses']} misses ({cache.hit_rate():.0%} hit rate), "
+                f"{cache.stats['evicted']} evicted"
+            )
+        self.report = self.fetcher.metrics.report()
+        if self.report_path:
+            log_report(self.report, self.report_path)
+        return components
+
+
+async def crawl(
+    gh_token=None,
+    pypi_dump=None,
+    downloads_dump=None,
+    state_path=None,
+    cache_path=None,
+    thumbnail_dir=None,
+    changelog=None,
+    report_path=None,
+    workers=0,
+    full=False,
+    publish=None,
+    progress=no_progress,
+    spinner=None,
+    **fetcher_kwargs,
+):
+    state = CrawlState(state_path) if state_path else None
+    cache = ResponseCache(cache_path) if cache_path else None
+    pool = ParsePool(workers) if workers else contextlib.nullcontext()
+    try:
+        with pool as pool:
+            async with Fetcher(
+                state=state, cache=cache, pool=pool, **fetcher_kwargs
+            ) as fetcher:
+                crawler = Crawler(
+                    fetcher,
+                    gh_token,
+                    metadata=PyPIDumpSource(pypi_dump) if pypi_dump else None,
+                    downloads=(
+                        DownloadsDumpSource(downloads_dump) if downloads_dump else None
+                    ),
+                    thumbnails=ThumbnailStore(thumbnail_dir) if thumbnail_dir else None,
+                    changelog=changelog,
+                    report_path=report_path,
+                    full=full,
+                    publish=publish,
+                    progress=progress,
+                    spinner=spinner,
+                )
+                return await crawler.crawl()
+    finally:
+        if state is not None:
+            state.close()
+        if cache is not None:
+            cache.evict()
+            cache.close()
+
+
+def get_components(*args, **kwargs):
+    """Crawls all components.
+
+    If `pypi_dump` is given, PyPI metadata is read from that local mirror of the JSON
+    API instead (see `sources.PyPIDumpSource`). If `downloads_dump` is given, download
+    numbers are read from that CSV or Parquet file (see
+    `downloads.DownloadsDumpSource`). If `state_path` is given, the crawl state is
+    stored in that SQLite file, so the next crawl only re-parses what changed and
+    doesn't probe Github again for packages whose repo we know (see `state.py` and
+    `repos.py`). If `cache_path` is given, responses are cached in that SQLite file (see
+    `cache.py`). If `thumbnail_dir` is given, thumbnails of preview images are stored in
+    that directory (see `thumbnails.py`). If `report_path` is given, a report of request
+    counts, bytes, latencies etc. per stage and source is appended to that file (see
+    `metrics.py`). If `workers` is given, parsing runs in that many processes (see
+    `parsing.py`). With a crawl state, only fields that are due are refreshed (see
+    `scheduler.py`), unless `full` is set. If `publish` is given, it's called with
+    partial results while the crawl goes on (see `Crawler`). Other keyword arguments are
+    passed on to `fetch.Fetcher`.
+    """
+    return asyncio.run(crawl(*args, **kwargs))
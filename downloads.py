@@ -0,0 +1,121 @@
+"""Sources for download numbers.
+
+A source takes a list of package names and returns a dict from each package to
+`Downloads` (packages without numbers are left out). `PypistatsSource` asks the
+pypistats API, one request per package, but all of them concurrently and each returns
+day, week and month at once. `DownloadsDumpSource` reads all numbers from a local
+CSV or Parquet file, e.g. an export of the PyPI downloads dataset on BigQuery, so the
+crawl doesn't need any requests for this step.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import timedelta
+
+import httpx
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from sources import normalize
+
+
+@dataclass
+class Downloads:
+    last_day: int = 0
+    last_week: int = 0
+    last_month: int = 0
+
+
+class PypistatsSource:
+    def __init__(self, fetcher):
+        self.fetcher = fetcher
+
+    async def get_downloads(self, packages):
+        results = await asyncio.gather(*map(self.get, packages))
+        return {p: d for p, d in zip(packages, results) if d is not None}
+
+    async def get(self, package):
+        # Hitting the API directly instead of using the pypistats package, which is
+        # sync and builds a whole dataframe for a few numbers.
+        def parse(response):
+            if response.status_code == 404:
+                return Downloads()
+            response.raise_for_status()
+            data = response.json()["data"]
+            return Downloads(data["last_day"], data["last_week"], data["last_month"])
+
+        url = f"https://pypistats.org/api/packages/{package.lower()}/recent"
+        try:
+            return await self.fetcher.get_parsed(url, parse)
+        except httpx.HTTPStatusError:
+            # The fetcher already retried with backoff, give up.
+            return None
+
+
+class DownloadsDumpSource:
+    """Reads download numbers from a CSV or Parquet file (by file extension).
+
+    The file either has the numbers already, in columns `project`, `last_day`,
+    `last_week` and `last_month`, or it has one row per project and day, in columns
+    `project`, `date` and `downloads`. The latter is what you get from BigQuery with:
+
+        SELECT file.project AS project, DATE(timestamp) AS date, COUNT(*) AS downloads
+        FROM `bigquery-public-data.pypi.file_downloads`
+        WHERE DATE(timestamp) >= DATE_SUB(CURRENT_DATE(), INTERVAL 31 DAY)
+        GROUP BY project, date
+
+    Days are counted back from the newest date in the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._downloads = None
+
+    def read_table(self):
+        if self.path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            return pq.read_table(self.path)
+        import pyarrow.csv as csv
+
+        return csv.read_csv(self.path)
+
+    def load(self):
+        table = self.read_table()
+        projects = [normalize(p) for p in table["project"].to_pylist()]
+        if "last_month" in table.column_names:
+            counts = zip(
+                *(
+                    table[column].fill_null(0).to_pylist()
+                    for column in ["last_day", "last_week", "last_month"]
+                )
+            )
+            return {p: Downloads(*c) for p, c in zip(projects, counts)}
+
+        table = table.set_column(
+            table.column_names.index("project"), "project", pa.array(projects)
+        )
+        dates = pc.cast(table["date"], pa.date32())
+        newest = pc.max(dates).as_py()
+        downloads = {}
+        for name, days in [("last_day", 1), ("last_week", 7), ("last_month", 30)]:
+            start = pa.scalar(newest - timedelta(days=days - 1), pa.date32())
+            sums = (
+                table.filter(pc.greater_equal(dates, start))
+                .group_by("project")
+                .aggregate([("downloads", "sum")])
+            )
+            for p, n in zip(
+                sums["project"].to_pylist(), sums["downloads_sum"].to_pylist()
+            ):
+                setattr(downloads.setdefault(p, Downloads()), name, n or 0)
+        return downloads
+
+    async def get_downloads(self, packages):
+        if self._downloads is None:
+            self._downloads = self.load()
+        return {
+            p: self._downloads[normalize(p)]
+            for p in packages
+            if normalize(p) in self._downloads
+        }
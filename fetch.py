@@ -0,0 +1,404 @@
+"""HTTP layer for the crawler.
+
+All requests go through `Fetcher`, an async httpx client that keeps connections alive
+(over HTTP/2 if the `h2` package is installed), limits how many requests run in
+parallel against each host and in total, and rate-limits each host with a token
+bucket. GET requests can be served from a `cache.ResponseCache`. Failed requests
+(connection errors, 429s, 5xxs and Github rate limits) are retried with exponential
+backoff and jitter, or as long as the server tells us to wait.
+"""
+
+import asyncio
+import contextlib
+import email.utils
+import hashlib
+import inspect
+import random
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from metrics import Metrics
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# Max. number of requests in flight per host.
+DEFAULT_CONCURRENCY = 10
+
+# Max. number of requests in flight across all hosts.
+DEFAULT_TOTAL_CONCURRENCY = 50
+
+# Status codes worth retrying. 403 is only retried if it's Github's rate limit.
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Status codes of responses that are stored in the response cache.
+CACHE_STATUS_CODES = {200, 404}
+
+# Requests per second per host. Github starts returning 403s if we hammer it, and
+# pypistats is pretty strict as well.
+DEFAULT_RATES = {
+    "github.com": 5,
+    "api.github.com": 5,
+    "pypistats.org": 5,
+    "pypi.org": 20,
+}
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to
+    `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        """Waits until a token is available and takes it. Returns the time waited."""
+        # Lock is created lazily so it's bound to the loop that's actually running.
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return now - start
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def parse_retry_after(value):
+    """Returns the seconds to wait from a Retry-After header (seconds or HTTP date)."""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        date = email.utils.parsedate_to_datetime(value)
+        return max(0.0, date.timestamp() - time.time())
+
+
+def server_delay(response):
+    """Returns how long the server wants us to wait before retrying, None if it
+    doesn't say."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        with contextlib.suppress(ValueError, TypeError):
+            return parse_retry_after(retry_after)
+    # Github sends the time its rate limit resets instead.
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        reset = response.headers.get("X-RateLimit-Reset")
+        if reset and reset.isdigit():
+            return max(0.0, int(reset) - time.time())
+    return None
+
+
+async def maybe_await(value):
+    return await value if inspect.isawaitable(value) else value
+
+
+def cached_response(url, status_code, headers, body):
+    return httpx.Response(
+        status_code, headers=headers, content=body, request=httpx.Request("GET", url)
+    )
+
+
+def should_retry(response):
+    if response.status_code in RETRY_STATUS_CODES:
+        return True
+    return response.status_code == 403 and server_delay(response) is not None
+
+
+class Fetcher:
+    """Async HTTP client shared by all crawl steps.
+
+    Use as an async context manager. `concurrency` is the max. number of parallel
+    requests per host, `total_concurrency` across all hosts, `rates` maps hosts to
+    requests per second (hosts not in there are not rate-limited). Failed requests are
+    retried up to `retries` times, waiting `backoff * 2**attempt` seconds (with full
+    jitter) or what the server asks for, but never longer than `max_wait`.
+
+    `origins` maps real origins to other ones, e.g.
+    `{"https://pypi.org": "http://localhost:8000"}`, so the crawler can be pointed at a
+    local stub server. If `state` (a `state.CrawlState`) is given, `get_parsed` sends
+    conditional requests and only parses content that changed. If `cache` (a
+    `cache.ResponseCache`) is given, GET requests are answered from it while they're
+    fresh. All requests are recorded in `metrics` (a `metrics.Metrics`). If `pool` (a
+    `parsing.ParsePool`) is given, `parse` runs functions in it.
+    """
+
+    def __init__(
+        self,
+        concurrency=DEFAULT_CONCURRENCY,
+        total_concurrency=DEFAULT_TOTAL_CONCURRENCY,
+        rates=None,
+        origins=None,
+        timeout=30,
+        state=None,
+        cache=None,
+        metrics=None,
+        pool=None,
+        retries=4,
+        backoff=1.0,
+        max_wait=300,
+    ):
+        self.concurrency = concurrency
+        self.total_concurrency = total_concurrency
+        self.rates = DEFAULT_RATES if rates is None else rates
+        self.origins = origins or {}
+        self.timeout = timeout
+        self.state = state
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.pool = pool
+        self.retries = retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self._client = None
+        self._semaphores = {}
+        self._buckets = {}
+        self._total = None
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            follow_redirects=True,
+            http2=HTTP2,
+            limits=httpx.Limits(
+                max_connections=self.total_concurrency,
+                max_keepalive_connections=self.total_concurrency,
+            ),
+        )
+        self._total = asyncio.Semaphore(self.total_concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._client = None
+
+    def _rewrite(self, url):
+        for origin, replacement in self.origins.items():
+            if url.startswith(origin):
+                return replacement.rstrip("/") + url[len(origin) :]
+        return url
+
+    def _semaphore(self, host):
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[host]
+
+    def _bucket(self, host):
+        if host not in self._buckets and host in self.rates:
+            self._buckets[host] = TokenBucket(self.rates[host])
+        return self._buckets.get(host)
+
+    def retry_delay(self, attempt, response=None):
+        """Returns how long to wait before the next attempt, None to give up."""
+        if attempt >= self.retries:
+            return None
+        delay = server_delay(response) if response is not None else None
+        if delay is None:
+            delay = random.uniform(0, self.backoff * 2**attempt)
+        return delay if delay <= self.max_wait else None
+
+    async def _send(self, method, url, stream=False, **kwargs):
+        """Sends a single request within the host's limits. Limits and rates are
+        applied based on the original host, not the rewritten one."""
+        host = urlsplit(url).hostname
+        async with self._semaphore(host), self._total:
+            bucket = self._bucket(host)
+            if bucket is not None:
+                self.metrics[url].rate_limit_wait += await bucket.acquire()
+            request = self._client.build_request(method, self._rewrite(url), **kwargs)
+            start = time.perf_counter()
+            try:
+                response = await self._client.send(request, stream=stream)
+            except httpx.HTTPError:
+                self.metrics.error(url, time.perf_counter() - start)
+                raise
+            # Streamed bodies are counted once they're read, see `get_parsed_stream`.
+            self.metrics.response(
+                url,
+                response.status_code,
+                time.perf_counter() - start,
+                0 if stream else response.num_bytes_downloaded,
+            )
+            return response
+
+    async def _send_with_retries(self, method, url, stream=False, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                response = await self._send(method, url, stream=stream, **kwargs)
+            except httpx.TransportError:
+                delay = self.retry_delay(attempt)
+                if delay is None:
+                    raise
+            else:
+                delay = (
+                    self.retry_delay(attempt, response)
+                    if should_retry(response)
+                    else None
+                )
+                if delay is None:
+                    return response
+                await response.aclose()
+            # Sleep outside of the semaphores, so other requests can go on.
+            self.metrics[url].retries += 1
+            self.metrics[url].backoff_wait += delay
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def request(self, method, url, **kwargs):
+        """Sends a request (with retries) and returns the `httpx.Response`."""
+        if self.cache is None or method != "GET":
+            return await self._send_with_retries(method, url, **kwargs)
+
+        key = str(httpx.URL(url, params=kwargs.get("params")))
+        cached = self.cache.get(key)
+        if cached is not None and cached[3]:
+            self.cache.stats["hits"] += 1
+            self.metrics[url].cache_hits += 1
+            return cached_response(key, *cached[:3])
+
+        # Revalidate stale responses, unless the caller sends its own conditional
+        # headers (e.g. `get_parsed` with a crawl state).
+        headers = httpx.Headers(kwargs.pop("headers", None))
+        conditional = "If-None-Match" in headers or "If-Modified-Since" in headers
+        if cached is not None and not conditional:
+            if "etag" in cached[1]:
+                headers["If-None-Match"] = cached[1]["etag"]
+            if "last-modified" in cached[1]:
+                headers["If-Modified-Since"] = cached[1]["last-modified"]
+        response = await self._send_with_retries(method, url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and cached is not None:
+            self.cache.touch(key)
+            self.cache.stats["revalidated"] += 1
+            if not conditional:
+                self.metrics[url].not_modified += 1
+                return cached_response(key, *cached[:3])
+        elif response.status_code in CACHE_STATUS_CODES:
+            self.cache.stats["misses"] += 1
+            self.cache.put(
+                key, response.status_code, response.headers, response.content
+            )
+        return response
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        """Like `request`, but doesn't load the body. Use as an async context manager
+        and read the body with `response.aiter_text()` etc."""
+        response = await self._send_with_retries(method, url, stream=True, **kwargs)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    async def parse(self, func, *args, **kwargs):
+        """Runs a CPU-bound function in the parse pool (or right here if there's
+        none). Use this in `parse` functions passed to `get_parsed`."""
+        if self.pool is None:
+            return func(*args, **kwargs)
+        return await self.pool.run(func, *args, **kwargs)
+
+    async def get_parsed(self, url, parse, headers=None, params=None):
+        """Gets a URL and returns `parse(response)`. `parse` can be a coroutine
+        function, e.g. to run the actual parsing with `Fetcher.parse`.
+
+        With a crawl state, this sends the ETag/Last-Modified we got last time. If the
+        server answers with 304 or the content hash didn't change, the parsed result
+        from last time is returned without calling `parse` again.
+
+        With a parse pool, the request only goes out once there's room in the pool's
+        queue (see `parsing.ParsePool.in_flight`).
+        """
+        if self.pool is None:
+            return await self._get_parsed(url, parse, headers, params)
+        async with self.pool.in_flight():
+            return await self._get_parsed(url, parse, headers, params)
+
+    async def _get_parsed(self, url, parse, headers, params):
+        if self.state is None:
+            response = await self.request("GET", url, headers=headers, params=params)
+            return await maybe_await(parse(response))
+
+        key = str(httpx.URL(url, params=params))
+        resource, headers = self._conditional(key, headers)
+        response = await self.request("GET", url, headers=headers, params=params)
+        if response.status_code == 304 and resource is not None:
+            self.state.touch(key)
+            self.metrics[url].not_modified += 1
+            return resource.parsed
+
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        if (
+            resource is not None
+            and resource.status_code == response.status_code
+            and resource.content_hash == content_hash
+        ):
+            self.state.touch(key)
+            self.metrics[url].not_modified += 1
+            return resource.parsed
+
+        parsed = await maybe_await(parse(response))
+        self._store(key, response, content_hash, parsed)
+        return parsed
+
+    async def get_parsed_stream(self, url, parser, headers=None):
+        """Gets a URL and feeds the body to `parser.feed` chunk by chunk while it's
+        downloading, so large responses never have to be in memory at once. Returns
+        `parser.close()`.
+
+        Uses the crawl state (if any) like `get_parsed`, but since parsing happens while
+        downloading, it's only skipped on 304s.
+        """
+        resource, headers = self._conditional(url, headers)
+        async with self.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and resource is not None:
+                self.state.touch(url)
+                self.metrics[url].not_modified += 1
+                return resource.parsed
+            response.raise_for_status()
+            hasher = hashlib.sha256()
+            async for chunk in response.aiter_text():
+                hasher.update(chunk.encode())
+                parser.feed(chunk)
+            self.metrics[url].bytes += response.num_bytes_downloaded
+        parsed = parser.close()
+        self._store(url, response, hasher.hexdigest(), parsed)
+        return parsed
+
+    def _conditional(self, key, headers):
+        """Returns the stored resource for `key` and headers for a conditional
+        request."""
+        headers = dict(headers or {})
+        resource = self.state.get(key) if self.state is not None else None
+        if resource is not None:
+            if resource.etag:
+                headers["If-None-Match"] = resource.etag
+            if resource.last_modified:
+                headers["If-Modified-Since"] = resource.last_modified
+        return resource, headers
+
+    def _store(self, key, response, content_hash, parsed):
+        if self.state is not None:
+            self.state.put(
+                key,
+                response.status_code,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                content_hash,
+                parsed,
+            )
@@ -0,0 +1,222 @@
+"""Sources for Github repo data.
+
+A source takes a list of (owner, repo) tuples and returns a dict from each tuple to a
+`RepoInfo` (or None if the repo doesn't exist). `GraphQLSource` asks for up to
+`batch_size` repos in a single GraphQL query, incl. the README, so a whole crawl only
+needs a few dozen requests. `RESTSource` uses one REST request per repo, it's only
+needed if there's no Github token (the GraphQL API requires one).
+"""
+
+import asyncio
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+# README names we look for, in this order. Has to be a fixed list, since GraphQL can
+# only fetch files by exact path.
+README_NAMES = ["README.md", "readme.md", "Readme.md", "README.rst", "README"]
+
+REPO_FIELDS = """
+    stargazerCount
+    description
+    createdAt
+    owner { avatarUrl }
+""" + "".join(
+    f'    readme{i}: object(expression: "HEAD:{name}") {{ ... on Blob {{ text }} }}\n'
+    for i, name in enumerate(README_NAMES)
+)
+
+
+@dataclass
+class RepoInfo:
+    stars: int = None
+    description: str = None
+    avatar: str = None
+    created_at: datetime = None
+    readme: str = None  # raw README file, None if not fetched or not found
+    readme_name: str = None
+
+
+def parse_repo(url):
+    """Returns (owner, repo) from a Github URL, None if it's not a link to a repo."""
+    url = url.replace("https://", "").replace("http://", "")
+    parts = url.split("/")
+    if len(parts) < 3 or not parts[1] or not parts[2]:
+        return None
+    return parts[1], parts[2]
+
+
+def parse_created_at(s):
+    return datetime.strptime(s, "%Y-%m-%dT%H:%M:%SZ")
+
+
+class GraphQLSource:
+    def __init__(self, fetcher, gh_token, batch_size=50):
+        self.fetcher = fetcher
+        self.gh_token = gh_token
+        self.batch_size = batch_size
+
+    async def get_repos(self, repos):
+        repos = list(dict.fromkeys(repos))  # remove duplicates, keep order
+        batches = [
+            repos[i : i + self.batch_size]
+            for i in range(0, len(repos), self.batch_size)
+        ]
+        results = {}
+        batch_results = await asyncio.gather(
+            *map(self.get_batch, batches), return_exceptions=True
+        )
+        for batch, batch_result in zip(batches, batch_results):
+            if isinstance(batch_result, Exception):
+                # Leave these repos out, so the rest of the crawl can go on.
+                print(f"Couldn't get {len(batch)} repos from Github: {batch_result}")
+            else:
+                results.update(batch_result)
+        return results
+
+    async def get_batch(self, repos):
+        # Owners and names go in as variables, so we don't have to escape anything.
+        variables = {}
+        definitions = []
+        selections = []
+        for i, (owner, name) in enumerate(repos):
+            variables[f"o{i}"], variables[f"n{i}"] = owner, name
+            definitions.append(f"$o{i}: String!, $n{i}: String!")
+            selections.append(
+                f"r{i}: repository(owner: $o{i}, name: $n{i}) {{{REPO_FIELDS}}}"
+            )
+        query = f"query({', '.join(definitions)}) {{\n" + "\n".join(selections) + "\n}"
+
+        attempt = 0
+        while True:
+            response = await self.fetcher.request(
+                "POST",
+                GRAPHQL_URL,
+                json={"query": query, "variables": variables},
+                headers={"Authorization": f"bearer {self.gh_token}"},
+            )
+            if response.status_code != 200:
+                raise RuntimeError(
+                    f"Couldn't get repo details from Github GraphQL API, status code {response.status_code}"
+                )
+            response_json = response.json()
+            errors = response_json.get("errors") or []
+            # Rate limits can come back as a 200 with an error, retry like a 429.
+            if not any(e.get("type") == "RATE_LIMITED" for e in errors):
+                break
+            delay = self.fetcher.retry_delay(attempt, response)
+            if delay is None:
+                raise RuntimeError("Github GraphQL API rate limit exceeded")
+            self.fetcher.metrics[GRAPHQL_URL].retries += 1
+            self.fetcher.metrics[GRAPHQL_URL].backoff_wait += delay
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        # Errors belong to a single repo (by the alias in their path), e.g. repos that
+        # don't exist come back as null with a NOT_FOUND error. Only errors without a
+        # path are a problem for the whole batch.
+        failed = set()
+        for e in errors:
+            path = e.get("path") or []
+            if not path:
+                raise RuntimeError(f"Github GraphQL API returned errors: {errors}")
+            if e.get("type") != "NOT_FOUND":
+                # E.g. FORBIDDEN for repos that were blocked. Leave these out, so we
+                # try again next time.
+                print(f"Couldn't get repo {path[0]} from Github: {e.get('message')}")
+                failed.add(path[0])
+
+        data = response_json.get("data") or {}
+        results = {}
+        for i, repo in enumerate(repos):
+            alias = f"r{i}"
+            if alias in failed:
+                continue
+            repo_json = data.get(alias)
+            if repo_json is None:
+                results[repo] = None
+                continue
+            info = RepoInfo(
+                stars=repo_json["stargazerCount"],
+                description=repo_json["description"],
+                avatar=repo_json["owner"]["avatarUrl"],
+                created_at=parse_created_at(repo_json["createdAt"]),
+            )
+            for j, readme_name in enumerate(README_NAMES):
+                readme = repo_json.get(f"readme{j}")
+                if readme and readme.get("text") is not None:
+                    info.readme, info.readme_name = readme["text"], readme_name
+                    break
+            results[repo] = info
+        return results
+
+
+class RESTSource:
+    def __init__(self, fetcher, gh_token=None):
+        self.fetcher = fetcher
+        self.gh_token = gh_token
+
+    async def get_repos(self, repos):
+        repos = list(dict.fromkeys(repos))
+        infos = await asyncio.gather(
+            *(self.get_repo(*repo) for repo in repos), return_exceptions=True
+        )
+        results = {}
+        for repo, info in zip(repos, infos):
+            # TODO: Handle this better. Sometimes Github shows 401 errors.
+            if not isinstance(info, Exception):
+                results[repo] = info
+        return results
+
+    def headers(self):
+        headers = {"Accept": "application/vnd.github.v3+json"}
+        if self.gh_token:
+            headers["Authorization"] = f"Token {self.gh_token}"
+        return headers
+
+    async def get_repo(self, user, repo):
+        """use the github api to get the number of stars for a given repo"""
+
+        def parse(response):
+            if response.status_code == 404:
+                return None
+            elif response.status_code != 200:
+                raise RuntimeError(
+                    f"Couldn't get repo details, status code {response.status_code} for user: {user}, repo: {repo}"
+                )
+            response_json = response.json()
+            return RepoInfo(
+                stars=response_json["stargazers_count"],
+                description=response_json["description"],
+                avatar=response_json["owner"]["avatar_url"],
+                created_at=parse_created_at(response_json["created_at"]),
+            )
+
+        # Conditional requests that return 304 don't count against Github's rate limit.
+        return await self.fetcher.get_parsed(
+            f"https://api.github.com/repos/{user}/{repo}", parse, headers=self.headers()
+        )
+
+    async def get_readme(self, user, repo):
+        """Returns (text, file name) of the raw README, (None, None) if there's none.
+        Github finds the README wherever it is, so this also works for names that
+        aren't in `README_NAMES`."""
+
+        def parse(response):
+            if response.status_code == 404:
+                return None, None
+            elif response.status_code != 200:
+                raise RuntimeError(
+                    f"Couldn't get README, status code {response.status_code} for user: {user}, repo: {repo}"
+                )
+            response_json = response.json()
+            text = base64.b64decode(response_json["content"]).decode(errors="replace")
+            return text, response_json["name"]
+
+        return await self.fetcher.get_parsed(
+            f"https://api.github.com/repos/{user}/{repo}/readme",
+            parse,
+            headers=self.headers(),
+        )
@@ -0,0 +1,123 @@
+"""Instrumentation of the crawl.
+
+`fetch.Fetcher` records every request in `Metrics`, grouped by source (see `source`):
+request counts, status codes, bytes, a latency histogram, cache hits, 304s, retries and
+time spent waiting for rate limits or backoff. The crawler additionally times each
+stage with `Metrics.stage`. `report` turns it all into a dict, which `log_report`
+appends to a JSON lines file, one line per crawl.
+"""
+
+import contextlib
+import json
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import datetime
+from urllib.parse import urlsplit
+
+# Upper bounds of the latency histogram buckets in seconds, the last bucket is
+# everything above.
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+
+def source(url):
+    """Groups URLs by where they go and what they're for."""
+    parts = urlsplit(url)
+    host, path = parts.hostname, parts.path
+    if host == "discuss.streamlit.io":
+        return "forum"
+    elif host == "pypi.org":
+        return "pypi_index" if path.startswith("/simple") else "pypi_json"
+    elif host == "pypistats.org":
+        return "pypistats"
+    elif host == "api.github.com":
+        if path == "/graphql":
+            return "github_graphql"
+        elif path.endswith("/readme"):
+            return "readme"
+        return "github_api"
+    return "images"
+
+
+class SourceMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.status_codes = Counter()
+        self.errors = 0
+        self.bytes = 0
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_total = 0.0
+        self.cache_hits = 0
+        self.not_modified = 0  # 304s and unchanged content, i.e. nothing re-parsed
+        self.retries = 0
+        self.rate_limit_wait = 0.0
+        self.backoff_wait = 0.0
+
+    def report(self):
+        cached = self.cache_hits + self.not_modified
+        total = self.requests + self.cache_hits
+        return {
+            "requests": self.requests,
+            "status_codes": dict(sorted(self.status_codes.items())),
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "latency_histogram": dict(
+                zip([str(b) for b in LATENCY_BUCKETS] + ["inf"], self.latency)
+            ),
+            "latency_mean": self.latency_total / self.requests if self.requests else 0,
+            "cache_hits": self.cache_hits,
+            "not_modified": self.not_modified,
+            "cache_hit_ratio": cached / total if total else 0,
+            "retries": self.retries,
+            "rate_limit_wait": round(self.rate_limit_wait, 3),
+            "backoff_wait": round(self.backoff_wait, 3),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.sources = defaultdict(SourceMetrics)
+        self.stages = {}
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+
+    def __getitem__(self, url):
+        return self.sources[source(url)]
+
+    def response(self, url, status_code, latency, size=0):
+        m = self[url]
+        m.requests += 1
+        m.status_codes[status_code] += 1
+        m.latency[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        m.latency_total += latency
+        m.bytes += size
+
+    def error(self, url, latency):
+        m = self[url]
+        m.requests += 1
+        m.errors += 1
+        m.latency[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        m.latency_total += latency
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Times a crawl stage, stages with the same name add up."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0) + time.perf_counter() - start
+
+    def report(self):
+        return {
+            "started_at": self.started_at.isoformat(),
+            "duration": round(time.perf_counter() - self._start, 3),
+            "stages": {name: round(t, 3) for name, t in self.stages.items()},
+            "sources": {name: m.report() for name, m in sorted(self.sources.items())},
+        }
+
+
+def log_report(report, path):
+    """Appends the report of a crawl to a JSON lines file."""
+    with open(path, "a") as f:
+        f.write(json.dumps(report) + "\n")
@@ -0,0 +1,85 @@
+"""Runs CPU-bound parsing in a process pool, separate from fetching.
+
+The crawler fetches with asyncio on a single core, so parsing (JSON metadata, READMEs,
+thumbnails) would block it. With a `ParsePool`, `fetch.Fetcher.parse` hands the work
+to other processes instead, while the event loop keeps downloading. At most
+`max_pending` jobs wait for the pool at once (a bounded queue). That alone doesn't stop
+bodies from piling up, since they're downloaded before they wait for the queue. So
+`fetch.Fetcher.get_parsed` also takes one of `max_in_flight` slots (see `in_flight`)
+before it sends a request and keeps it until parsing is done. If parsing can't keep
+up, fetching is slowed down rather than piling up bodies in memory.
+
+Functions (and their arguments) are sent to the workers, so they have to be picklable,
+i.e. defined at the top level of a module.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# BeautifulSoup parser for HTML, lxml is a lot faster if it's installed.
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Responses that are downloading or waiting to be parsed. A bit more than
+# `fetch.DEFAULT_TOTAL_CONCURRENCY`, so downloads can go on while the pool is busy.
+DEFAULT_MAX_IN_FLIGHT = 100
+
+# If the current task already holds an in-flight slot, so nested requests (e.g. in a
+# `parse` function) don't wait for a slot that they're holding themselves.
+_holding_slot = contextvars.ContextVar("holding_slot", default=False)
+
+
+class ParsePool:
+    def __init__(self, workers=None, max_pending=None, max_in_flight=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 4 * self.workers
+        self.max_in_flight = max_in_flight or DEFAULT_MAX_IN_FLIGHT
+        self._executor = None
+        self._pending = None
+        self._in_flight = None
+
+    def __enter__(self):
+        # "spawn" instead of "fork", since this may run in a thread of the app.
+        self._executor = ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        self._executor.shutdown(cancel_futures=True)
+        self._executor = None
+
+    @contextlib.asynccontextmanager
+    async def in_flight(self):
+        """Holds one of `max_in_flight` slots, from sending a request until its
+        response is parsed."""
+        if _holding_slot.get():
+            yield
+            return
+        if self._in_flight is None:
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        async with self._in_flight:
+            token = _holding_slot.set(True)
+            try:
+                yield
+            finally:
+                _holding_slot.reset(token)
+
+    async def run(self, func, *args, **kwargs):
+        """Runs `func(*args, **kwargs)` in a worker process and returns the result."""
+        # Semaphore is created lazily so it's bound to the loop that's actually running.
+        if self._pending is None:
+            self._pending = asyncio.Semaphore(self.max_pending)
+        async with self._pending:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
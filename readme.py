@@ -0,0 +1,143 @@
+"""Extracts preview image, description and demo link from raw README files.
+
+Works on the raw markdown (or RST) instead of the rendered Github page, which is 10x
+bigger and needs a full HTML parse. Handles HTML inside markdown, reference-style
+images and relative image paths, and skips badges and logos.
+"""
+
+import html
+import re
+
+# Image URLs containing any of these are badges, logos etc., not screenshots.
+BADGE_MARKERS = [
+    "badge",
+    "shields.io",
+    "circleci",
+    "buymeacoffee",
+    "ko-fi",
+    "logo",
+    "streamlit-mark",
+    "coverage",
+    "Cover",
+    "hydra.png",
+]
+
+MD_IMAGE = re.compile(r"!\[[^\]]*\]\(\s*<?([^)\s>]+)>?(?:\s+[\"'][^)]*[\"'])?\s*\)")
+MD_REF_IMAGE = re.compile(r"!\[([^\]]*)\]\[([^\]]*)\]")
+MD_REF_DEFINITION = re.compile(r"^\s{0,3}\[([^\]]+)\]:\s*<?(\S+?)>?(?:\s+.*)?$", re.M)
+HTML_IMAGE = re.compile(r"<img\b[^>]*?\bsrc\s*=\s*[\"']?([^\"'\s>]+)", re.I)
+RST_IMAGE = re.compile(r"^\s*\.\. (?:\|[^|]+\|\s+)?(?:image|figure)::\s*(\S+)", re.M)
+HTML_PARAGRAPH = re.compile(r"<p\b[^>]*>(.*?)</p>", re.I | re.S)
+HTML_TAG = re.compile(r"<[^>]+>")
+HTML_COMMENT = re.compile(r"<!--.*?-->", re.S)
+CODE_FENCE = re.compile(r"^(```|~~~).*?^\1", re.M | re.S)
+LIST_ITEM = re.compile(r"^\s*([-*+]|\d+[.)])\s")
+UNDERLINE = re.compile(r"[=\-~^`'\"#*+]{3,}")
+
+DEMO_PATTERNS = [
+    re.compile(r"https?://share\.streamlit\.io/+[^\s)\"'<>\]]*"),
+    re.compile(r"https?://[\w.-]+\.streamlitapp\.com[^\s)\"'<>\]]*"),
+    re.compile(r"https?://[\w.-]+\.streamlit\.app[^\s)\"'<>\]]*"),
+]
+
+
+def is_badge(src):
+    return any(marker in src for marker in BADGE_MARKERS)
+
+
+def resolve_url(src, owner, repo):
+    """Turns image paths relative to the repo root into absolute URLs, the same way
+    Github does it when rendering the README."""
+    src = html.unescape(src)
+    if src.startswith("//"):
+        return "https:" + src
+    if re.match(r"https?://", src):
+        # Images that link to the Github file viewer need to point to the raw file.
+        return re.sub(r"^(https?://github\.com/[^/]+/[^/]+)/blob/", r"\1/raw/", src)
+    path = re.sub(r"^(\./)+", "", src).lstrip("/")
+    return f"https://github.com/{owner}/{repo}/raw/HEAD/{path}"
+
+
+def find_images(text, rst=False):
+    """Returns all image URLs in the README, in the order they appear."""
+    if rst:
+        return [m.group(1) for m in RST_IMAGE.finditer(text)]
+    text = CODE_FENCE.sub("", HTML_COMMENT.sub("", text))  # not shown on Github
+    definitions = {
+        m.group(1).lower(): m.group(2) for m in MD_REF_DEFINITION.finditer(text)
+    }
+    images = []
+    for pattern in [MD_IMAGE, HTML_IMAGE, MD_REF_IMAGE]:
+        for m in pattern.finditer(text):
+            if pattern is MD_REF_IMAGE:
+                url = definitions.get((m.group(2) or m.group(1)).lower())
+                if url is None:
+                    continue
+            else:
+                url = m.group(1)
+            images.append((m.start(), url))
+    return [url for _, url in sorted(images)]
+
+
+def clean_text(text):
+    """Strips markdown and HTML formatting from a paragraph."""
+    text = re.sub(r"!\[[^\]]*\]\([^)]*\)", "", text)  # images
+    text = re.sub(r"!\[[^\]]*\]\[[^\]]*\]", "", text)  # reference images
+    text = re.sub(r"\[([^\]]*)\]\([^)]*\)", r"\1", text)  # links
+    text = re.sub(r"\[([^\]]*)\]\[[^\]]*\]", r"\1", text)  # reference links
+    text = re.sub(r"`([^`<]+)\s*<[^>]+>`_+", r"\1", text)  # RST links
+    text = HTML_TAG.sub("", text)
+    text = re.sub(r"(\*\*|__|\*|``|`)(\S(?:.*?\S)?)\1", r"\2", text)
+    text = html.unescape(text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def first_paragraph(text, rst=False):
+    """Returns the text of the first paragraph that's actual prose, i.e. not a
+    heading, list, table, code block, image or badge."""
+    text = CODE_FENCE.sub("", HTML_COMMENT.sub("", text or ""))
+    for block in re.split(r"\n\s*\n", text):
+        if block.startswith(("    ", "\t")):
+            continue  # indented code
+        block = block.strip()
+        if not block:
+            continue
+        lines = block.splitlines()
+        if rst and (block.startswith("..") or block.startswith(":")):
+            continue  # directive or field list
+        if block.startswith("<"):
+            # HTML block, only <p> elements count as paragraphs (like on Github).
+            for paragraph in HTML_PARAGRAPH.findall(block):
+                paragraph = clean_text(paragraph)
+                if paragraph:
+                    return paragraph
+            continue
+        if (
+            block.startswith(("#", "|"))
+            or LIST_ITEM.match(block)
+            or UNDERLINE.fullmatch(lines[0].strip())
+            or (len(lines) >= 2 and UNDERLINE.fullmatch(lines[1].strip()))
+        ):
+            continue  # heading, table, list, or RST section title
+        block = "\n".join(re.sub(r"^\s*>\s?", "", line) for line in lines)
+        paragraph = clean_text(block)
+        if paragraph:
+            return paragraph
+    return None
+
+
+def find_demo(text):
+    """Returns the first link to a Streamlit app in the README."""
+    for pattern in DEMO_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return match.group(0).rstrip(".,;:")
+    return None
+
+
+def parse_readme(text, owner, repo, name="README.md"):
+    """get the image url, description and demo link from a raw README file"""
+    rst = name.lower().endswith(".rst")
+    images = [src for src in find_images(text, rst) if not is_badge(src)]
+    image_url = resolve_url(images[0], owner, repo) if images else None
+    return image_url, first_paragraph(text, rst), find_demo(text)
@@ -0,0 +1,182 @@
+"""Keeps the catalog fresh in the background (stale-while-revalidate).
+
+`RefreshWorker` is a thread that loads the newest snapshot and, once it's older than
+`max_age`, builds a new one with `build_catalog.build`. The app keeps serving the
+current catalog the whole time. A new catalog is fully loaded (incl. search index)
+before it's swapped in with a single assignment, so visitors never wait for a crawl.
+Only the very first catalog is swapped in right away, since there's nothing to show
+before it; a search waits until its index is built. A failed refresh is retried with
+exponential backoff (see `RETRY_DELAY`).
+
+While a refresh runs, the partial snapshots it writes (fresh data for the most popular
+components first) are loaded by a second thread, so the crawl isn't blocked. If a newer
+snapshot shows up while a search index is built, building it is cancelled. If the crawl
+fails, its partial snapshot is removed and the last full one is shown again.
+"""
+
+import os
+import threading
+import time
+import traceback
+
+from build_catalog import SNAPSHOT_DIR, build
+from catalog import latest_snapshot, read_catalog
+from search import Cancelled
+
+# Downloads are the fastest-changing data we show, pypistats updates them daily.
+DEFAULT_MAX_AGE = 24 * 3600
+
+# After a failed refresh, wait this long before trying again, twice as long after each
+# further failure, but at most `MAX_RETRY_DELAY`. So replicas don't hit the forum, PyPI
+# and Github every minute while one of them is down.
+RETRY_DELAY = 10 * 60
+MAX_RETRY_DELAY = 6 * 3600
+
+# A lock older than this is assumed to be left over from a crashed refresh.
+STALE_LOCK_AGE = 6 * 3600
+
+
+class RefreshWorker(threading.Thread):
+    """Use `catalog` for the current catalog (None until the first one is loaded) and
+    `status()` for the refresh state. `build_kwargs` are passed to
+    `build_catalog.build`."""
+
+    def __init__(
+        self,
+        snapshots=SNAPSHOT_DIR,
+        max_age=DEFAULT_MAX_AGE,
+        check_interval=60,
+        retry_delay=RETRY_DELAY,
+        max_retry_delay=MAX_RETRY_DELAY,
+        **build_kwargs,
+    ):
+        super().__init__(name="catalog-refresh", daemon=True)
+        self.snapshots = snapshots
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.build_kwargs = build_kwargs
+        self.catalog = None
+        self.path = None
+        self.written_at = None  # mtime of `path`, which might be deleted by now
+        self.incomplete = False  # whether `catalog` is from a crawl that failed
+        self.state = "idle"
+        self.error = None
+        self.failures = 0  # refreshes that failed in a row
+        self.failed_at = None
+        self.ready = threading.Event()  # set once there's a catalog
+        self._new_snapshot = threading.Event()
+        self._load_lock = threading.Lock()
+
+    def status(self):
+        return {
+            "state": self.state,
+            "snapshot": self.path,
+            "age": self.age(),
+            "error": self.error,
+        }
+
+    def age(self):
+        """Seconds since the current snapshot was written, None if there's none."""
+        if self.written_at is None:
+            return None
+        return time.time() - self.written_at
+
+    def run(self):
+        threading.Thread(
+            target=self.load_new_snapshots, name="catalog-load", daemon=True
+        ).start()
+        while True:
+            try:
+                self.load_newest()
+                if self.is_due():
+                    self.refresh()
+            except Exception:
+                self.state = "failed"
+                self.error = traceback.format_exc()
+                print(self.error)
+            time.sleep(self.check_interval)
+
+    def is_due(self):
+        """Whether the catalog needs a refresh and we're not waiting after a failed
+        one."""
+        age = self.age()
+        if age is not None and age <= self.max_age and not self.incomplete:
+            return False
+        if self.failures:
+            delay = self.retry_delay * 2 ** (self.failures - 1)
+            return time.time() - self.failed_at >= min(delay, self.max_retry_delay)
+        return True
+
+    def load_new_snapshots(self):
+        """Loads snapshots that `refresh` announces while it's running."""
+        while True:
+            self._new_snapshot.wait()
+            self._new_snapshot.clear()
+            try:
+                self.load_newest()
+            except Exception:
+                traceback.print_exc()
+
+    def load_newest(self):
+        """Swaps in the newest snapshot if it's not loaded yet (it might have been
+        written by this worker, another replica or build_catalog.py)."""
+        with self._load_lock:
+            path = latest_snapshot(self.snapshots)
+            if path is None and self.path is not None and not os.path.exists(self.path):
+                # The partial snapshot of a first crawl that failed. Better than nothing,
+                # but it needs a refresh.
+                self.incomplete = True
+            if path is None or path == self.path:
+                return
+            superseded = lambda: latest_snapshot(self.snapshots) != path
+            try:
+                written_at = os.path.getmtime(path)
+                catalog = read_catalog(path)
+                if self.catalog is not None:
+                    catalog.warm_up(superseded)
+            except (FileNotFoundError, Cancelled):
+                # Replaced by a newer snapshot in the meantime.
+                return
+            self.catalog, self.path, self.written_at = catalog, path, written_at
+            self.incomplete = False
+            if not self.ready.is_set():
+                self.ready.set()
+                try:
+                    catalog.warm_up(superseded)
+                except Cancelled:
+                    pass
+
+    def refresh(self):
+        lock = os.path.join(self.snapshots, ".refresh.lock")
+        os.makedirs(self.snapshots, exist_ok=True)
+        if (
+            os.path.exists(lock)
+            and time.time() - os.path.getmtime(lock) > STALE_LOCK_AGE
+        ):
+            os.remove(lock)
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return  # someone else is refreshing already
+        try:
+            self.state = "refreshing"
+            build(
+                snapshots=self.snapshots,
+                on_snapshot=lambda path: self._new_snapshot.set(),
+                **self.build_kwargs,
+            )
+            self.error = None
+            self.state = "idle"
+            self.failures = 0
+        except Exception:
+            self.failures += 1
+            self.failed_at = time.time()
+            raise
+        finally:
+            os.close(fd)
+            os.remove(lock)
+            # Also if the crawl failed, so we go back to the last full snapshot instead of
+            # showing its partial one.
+            self.load_newest()
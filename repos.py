@@ -0,0 +1,123 @@
+"""Finds the Github repo of PyPI packages that the tracker doesn't link to one.
+
+The candidates for a package are, in this order: the Github links in its PyPI metadata
+(homepage, project URLs, download URL), then the PyPI author combined with the package
+name and its mutations (e.g. `-` -> `_`). The candidates of all packages are checked
+at once in batches (see `Crawler.get_repo_infos`), the first one that exists wins.
+
+The result is stored per package in the crawl state, also if no candidate exists, so
+packages aren't probed again on every crawl. Repos that were found are re-checked on the
+next crawl anyway (we get their stars etc. in the same request), but only that one repo.
+Packages without a repo are only checked again after `NEGATIVE_TTL`.
+"""
+
+import re
+import time
+
+from github import parse_repo
+
+DAY = 24 * 60 * 60
+NEGATIVE_TTL = 7 * DAY
+
+# The author from PyPI is only useful as a Github user if it's not a full name.
+USERNAME = re.compile(r"[A-Za-z0-9-]+")
+
+
+def normalize_repo(url):
+    """Returns (owner, repo) from a link to a Github repo (or something in it), None if
+    it's not one."""
+    url = re.sub(r"^(git\+)?(https?://)?(www\.)?", "", url.strip())
+    if not url.lower().startswith("github.com/"):
+        return None
+    repo = parse_repo(re.split(r"[?#]", url)[0])
+    if repo is None:
+        return None
+    owner, name = repo
+    if name.endswith(".git"):
+        name = name[: -len(".git")]
+    return (owner, name) if name else None
+
+
+def name_mutations(package):
+    """Repo names that a package could have, e.g. packages with "-" whose repos use
+    "_"."""
+    names = [package, package.replace("-", "_"), package.replace("_", "-")]
+    return list(dict.fromkeys(names))
+
+
+def repo_candidates(package, author=None, links=()):
+    """Returns all (owner, repo) tuples that could be the repo of a package, best
+    first."""
+    candidates = [normalize_repo(link) for link in links if link]
+    if author and USERNAME.fullmatch(author):
+        candidates += [(author, name) for name in name_mutations(package)]
+    return list(dict.fromkeys(c for c in candidates if c))
+
+
+def repo_url(repo):
+    return f"https://github.com/{repo[0]}/{repo[1]}"
+
+
+class RepoResolver:
+    """Resolves packages to Github repos. `get_repo_infos` checks a list of (owner,
+    repo) tuples (see `Crawler.get_repo_infos`). Results are stored in `state` (a
+    `state.CrawlState`) if it's given."""
+
+    def __init__(self, get_repo_infos, state=None, negative_ttl=NEGATIVE_TTL):
+        self.get_repo_infos = get_repo_infos
+        self.state = state
+        self.negative_ttl = negative_ttl
+        self.known = state.get_repos() if state is not None else {}
+        self.stats = {"known": 0, "skipped": 0, "found": 0, "not_found": 0}
+
+    async def resolve(self, packages):
+        """Takes a dict from package to (author, Github links) and returns a dict from
+        package to the repo URL. Packages without a repo (or where we couldn't check all
+        candidates) are left out."""
+        results = {}
+        todo = {}
+        known = {}
+        for package, (author, links) in packages.items():
+            repo, checked_at = self.known.get(package, (None, None))
+            if repo is not None:
+                known[package] = parse_repo(repo)
+            elif (
+                checked_at is not None and time.time() - checked_at < self.negative_ttl
+            ):
+                self.stats["skipped"] += 1
+            else:
+                todo[package] = repo_candidates(package, author, links or ())
+
+        # Repos we found before only need to be checked once more, if they're gone,
+        # look at all candidates again.
+        infos = await self.get_repo_infos(list(known.values()))
+        for package, repo in known.items():
+            if repo in infos and infos[repo] is None:
+                author, links = packages[package]
+                todo[package] = repo_candidates(package, author, links or ())
+            else:
+                results[package] = repo_url(repo)
+                self.stats["known"] += 1
+
+        infos = await self.get_repo_infos(
+            [repo for candidates in todo.values() for repo in candidates]
+        )
+        resolved = {}
+        for package, candidates in todo.items():
+            for repo in candidates:
+                if repo not in infos:
+                    # Couldn't check it, so we don't know if the next candidates are
+                    # right either. Try again on the next crawl.
+                    break
+                if infos[repo] is not None:
+                    resolved[package] = results[package] = repo_url(repo)
+                    self.stats["found"] += 1
+                    break
+            else:
+                resolved[package] = None
+                self.stats["not_found"] += 1
+
+        if self.state is not None:
+            self.state.put_repos(resolved)
+        self.known.update({p: (repo, time.time()) for p, repo in resolved.items()})
+        return results
@@ -0,0 +1,125 @@
+"""Decides which fields of which components a crawl refreshes.
+
+Fields change at very different speeds: stars and downloads every day, the README
+image every few weeks, and metadata like the author or creation date almost never. So
+fields are split into groups, each with its own TTL (`DEFAULT_TTLS`), and a crawl only
+fetches the groups that are due. Fields of groups that aren't due are kept from the
+last crawl (see `fill_fields`).
+
+To spread the work evenly instead of refreshing everything found in the first crawl in
+one burst a month later, each component gets a fixed offset into the TTL from a hash of
+its key. Time is cut into periods of one TTL, shifted by that offset, and a group is due
+once a new period started since it was refreshed last. With a daily crawl, about 1/7 of
+the READMEs are refreshed every day, and no group is ever older than its TTL plus the
+time between crawls.
+
+Within a crawl, components that are at the top of the app are refreshed first (see
+`priority_order`), in chunks that get bigger and bigger (see `priority_chunks`), so a
+partial catalog with fresh data for them can be published early.
+"""
+
+import hashlib
+import time
+from datetime import datetime
+
+from state import component_key
+
+DAY = 24 * 3600
+
+FIELD_GROUPS = {
+    "hot": ["stars", "downloads", "downloads_last_week", "downloads_last_day"],
+    # The Github description falls back to the first paragraph of the README.
+    "readme": ["image_url", "demo", "thumbnail", "github_description"],
+    "static": [
+        "pypi_author",
+        "pypi_description",
+        "uploaded_at",
+        "github",
+        "github_author",
+        "github_description",
+        "avatar",
+        "created_at",
+    ],
+}
+
+DEFAULT_TTLS = {"hot": DAY, "readme": 7 * DAY, "static": 30 * DAY}
+
+# What the app sorts by, with the values of the last run.
+PRIORITY_KEYS = [
+    lambda c: c.stars or 0,
+    lambda c: c.downloads or 0,
+    lambda c: c.created_at or datetime.min,
+]
+
+# Size of the first chunk of components and by how much each chunk is bigger than the
+# one before. The first one roughly covers the first page of each sorting.
+FIRST_CHUNK_SIZE = 100
+CHUNK_GROWTH = 4
+
+
+def fill_fields(c, previous, groups):
+    """Fills the fields of `groups` that are still empty in component `c` with the ones
+    from the last crawl. Fields we got from somewhere else (e.g. the tracker) win."""
+    for group in groups:
+        for field in FIELD_GROUPS[group]:
+            if getattr(c, field) is None:
+                setattr(c, field, getattr(previous, field))
+
+
+class Scheduler:
+    """Keeps track of when each group of each component was refreshed in `state` (a
+    `state.CrawlState`). Components are identified by `state.component_key`."""
+
+    def __init__(self, state, ttls=None, now=None):
+        self.state = state
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.now = time.time() if now is None else now
+        self.refreshed = state.get_refreshed()
+
+    def offset(self, key, group):
+        digest = hashlib.sha1(f"{group}:{key}".encode()).digest()
+        return int.from_bytes(digest[:8], "big") % self.ttls[group]
+
+    def is_due(self, key, group):
+        refreshed_at = self.refreshed.get((key, group))
+        if refreshed_at is None:
+            return True
+        ttl = self.ttls[group]
+        offset = self.offset(key, group)
+        return (self.now + offset) // ttl != (refreshed_at + offset) // ttl
+
+    def due_groups(self, key):
+        return {group for group in self.ttls if self.is_due(key, group)}
+
+    def done(self, refreshed):
+        """Stores that the groups in a dict from component key to groups were refreshed
+        now."""
+        pairs = [(key, group) for key, groups in refreshed.items() for group in groups]
+        self.state.put_refreshed(pairs, self.now)
+        self.refreshed.update({pair: self.now for pair in pairs})
+
+
+def priority_order(components, previous):
+    """Returns the components in the order they should be refreshed. `previous` is a
+    dict from component key to the component of the last run. Components come first if
+    they were high up in any sorting of the app. New ones go first of all, they're the
+    newest ones."""
+    new = [c for c in components if component_key(c) not in previous]
+    known = [c for c in components if component_key(c) in previous]
+    best_rank = {}
+    for key in PRIORITY_KEYS:
+        ranked = sorted(
+            known, key=lambda c: key(previous[component_key(c)]), reverse=True
+        )
+        for rank, c in enumerate(ranked):
+            k = component_key(c)
+            best_rank[k] = min(best_rank.get(k, rank), rank)
+    return new + sorted(known, key=lambda c: best_rank[component_key(c)])
+
+
+def priority_chunks(components, first=FIRST_CHUNK_SIZE, growth=CHUNK_GROWTH):
+    """Splits a list of components into chunks of growing size."""
+    start, size = 0, first
+    while start < len(components):
+        yield components[start : start + size]
+        start, size = start + size, size * growth
@@ -0,0 +1,181 @@
+"""Inverted index for searching components.
+
+Maps every token (and every prefix of it) in a component's name, package, author and
+descriptions to the components that contain it. Lookups are case-insensitive, every
+term in the query has to match, and results are ranked by where the terms matched.
+
+Terms that don't match anything are probably typos (e.g. "aggird" or "datframe"), so
+they match similar tokens instead. To find these quickly, there's a second index from
+each trigram (3 letters in a row) to the tokens that contain it. Tokens that share
+enough trigrams with the term are then checked with the Damerau-Levenshtein distance.
+"""
+
+import re
+from collections import Counter, defaultdict
+
+# Score of a match in each field.
+FIELD_BOOSTS = {
+    "name": 8,
+    "package": 6,
+    "github_author": 4,
+    "pypi_author": 4,
+    "github_description": 2,
+    "pypi_description": 1,
+}
+
+# Matching only the beginning of a token counts less than matching all of it.
+PREFIX_FACTOR = 0.5
+
+# A match with typos counts less, this is applied once per typo.
+TYPO_FACTOR = 0.5
+
+# Fuzzy postings of this many terms are kept, since every rerun of the app (e.g. going
+# to the next page) searches for the same terms again.
+FUZZY_CACHE_SIZE = 1000
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+# How often building the index checks if it was cancelled, in components.
+CANCEL_CHECK_INTERVAL = 1000
+
+
+class Cancelled(Exception):
+    """Building the index was cancelled, see `SearchIndex`."""
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def max_typos(term):
+    """Number of typos allowed in a term. None in short terms, they'd match too much."""
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+def trigrams(token):
+    # Padded, so the first and last letters count as much as the others.
+    token = f"${token}$"
+    return {token[i : i + 3] for i in range(len(token) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Damerau-Levenshtein distance between `a` and `b` (counting swapped neighbors as
+    one edit), or `limit + 1` if it's more than `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a[i - 1] != b[j - 1]),
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+class SearchIndex:
+    """Takes a dict from field name to the values of that field for all components,
+    e.g. `{"name": ["AgGrid", ...], "package": ["streamlit-aggrid", ...], ...}`.
+    Components are identified by their position in these lists. If `cancelled` is
+    given, it's called every now and then while building the index, and building stops
+    with `Cancelled` once it returns True."""
+
+    def __init__(self, columns, cancelled=None):
+        # term -> {component position: score}
+        self.postings = defaultdict(dict)
+        tokens = set()
+        for field, boost in FIELD_BOOSTS.items():
+            for i, value in enumerate(columns[field]):
+                if cancelled and i % CANCEL_CHECK_INTERVAL == 0 and cancelled():
+                    raise Cancelled()
+                for token in set(tokenize(value or "")):
+                    tokens.add(token)
+                    for n in range(1, len(token) + 1):
+                        score = boost if n == len(token) else boost * PREFIX_FACTOR
+                        postings = self.postings[token[:n]]
+                        postings[i] = max(postings.get(i, 0), score)
+        self.postings = dict(self.postings)
+
+        # trigram -> positions of the tokens in `self.tokens` that contain it
+        self.tokens = sorted(tokens)
+        self.trigrams = defaultdict(list)
+        for position, token in enumerate(self.tokens):
+            for trigram in trigrams(token):
+                self.trigrams[trigram].append(position)
+        self.trigrams = dict(self.trigrams)
+        self._fuzzy_postings = {}
+
+    def similar_tokens(self, term):
+        """Returns a dict from each token that's at most `max_typos(term)` edits away
+        from `term` to the number of edits."""
+        limit = max_typos(term)
+        if not limit:
+            return {}
+        term_trigrams = trigrams(term)
+        shared = Counter()
+        for trigram in term_trigrams:
+            shared.update(self.trigrams.get(trigram, ()))
+        # Each edit changes at most 4 trigrams (a swap of neighbors), so tokens that
+        # share fewer can't be close enough.
+        min_shared = max(1, len(term_trigrams) - 4 * limit)
+        similar = {}
+        for position, count in shared.items():
+            if count >= min_shared:
+                token = self.tokens[position]
+                distance = edit_distance(term, token, limit)
+                if distance <= limit:
+                    similar[token] = distance
+        return similar
+
+    def fuzzy_postings(self, term):
+        """Postings of all tokens similar to `term`, with lower scores."""
+        if term in self._fuzzy_postings:
+            return self._fuzzy_postings[term]
+        results = {}
+        # Start with the closest token, the others only add components or raise scores.
+        similar = sorted(self.similar_tokens(term).items(), key=lambda item: item[1])
+        for token, distance in similar:
+            factor = TYPO_FACTOR**distance
+            postings = self.postings[token]
+            if not results:
+                results = {i: score * factor for i, score in postings.items()}
+            else:
+                for i, score in postings.items():
+                    if score * factor > results.get(i, 0):
+                        results[i] = score * factor
+        if len(self._fuzzy_postings) >= FUZZY_CACHE_SIZE:
+            self._fuzzy_postings.clear()
+        self._fuzzy_postings[term] = results
+        return results
+
+    def search(self, query):
+        """Returns a dict from component position to score for all components that
+        match every term in `query`."""
+        postings_per_term = [
+            self.postings.get(term) or self.fuzzy_postings(term)
+            for term in set(tokenize(query))
+        ]
+        if not all(postings_per_term):
+            return {}
+        # Start with the rarest term, so the intersection stays small.
+        postings_per_term.sort(key=len)
+        results = None
+        for postings in postings_per_term:
+            if results is None:
+                results = dict(postings)
+            else:
+                results = {
+                    key: score + postings[key]
+                    for key, score in results.items()
+                    if key in postings
+                }
+        return results or {}
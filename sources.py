@@ -0,0 +1,126 @@
+"""Sources for PyPI package metadata.
+
+A source turns a package name into `PackageMetadata` (or None if the package doesn't
+exist). `PyPIJSONSource` reads the JSON API at https://pypi.org/pypi/<package>/json,
+`PyPIDumpSource` reads a local JSON lines mirror of it (one API response per line).
+"""
+
+import email.utils
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List
+
+from readme import first_paragraph
+
+
+@dataclass
+class PackageMetadata:
+    author: str = None
+    github_links: List[str] = None  # all links to Github, best first
+    description: str = None
+    uploaded_at: datetime = None  # first upload of the package to PyPI
+
+
+def normalize(package):
+    """Normalizes a package name as described in PEP 503."""
+    return re.sub(r"[-_.]+", "-", package).lower()
+
+
+def parse_upload_time(s):
+    return datetime.strptime(s.split(".")[0], "%Y-%m-%dT%H:%M:%S")
+
+
+def parse_author(info):
+    """Returns the author (or maintainer) from the "info" of a PyPI JSON response."""
+    for field in ["author", "maintainer"]:
+        author = (info.get(field) or "").strip()
+        if author and author != "UNKNOWN":
+            return author
+    # Packages built with hatch, flit etc. (PEP 621) often leave the author empty and
+    # only set e.g. "Jane Doe <jane@example.com>" as the email.
+    for field in ["author_email", "maintainer_email"]:
+        for name, _ in email.utils.getaddresses([info.get(field) or ""]):
+            if name.strip():
+                return name.strip()
+    return None
+
+
+def parse_pypi_json(data):
+    """Extracts `PackageMetadata` from a response of the PyPI JSON API."""
+    info = data["info"]
+    metadata = PackageMetadata()
+
+    # The JSON API doesn't expose the PyPI username of the uploader, so use the author
+    # from the package metadata.
+    metadata.author = parse_author(info)
+
+    links = [info.get("home_page")] + list((info.get("project_urls") or {}).values())
+    links.append(info.get("download_url"))
+    metadata.github_links = [link for link in links if link and "github.com" in link]
+
+    summary = (info.get("summary") or "").strip()
+    if summary and summary != "UNKNOWN":
+        metadata.description = summary
+    else:
+        rst = "rst" in (info.get("description_content_type") or "")
+        metadata.description = first_paragraph(info.get("description"), rst)
+
+    # "releases" contains all files ever uploaded, "urls" only the ones of the latest
+    # release (mirrors sometimes leave out the former).
+    files = [f for fs in (data.get("releases") or {}).values() for f in fs]
+    files = files or data.get("urls") or []
+    if files:
+        metadata.uploaded_at = min(parse_upload_time(f["upload_time"]) for f in files)
+    return metadata
+
+
+def parse_pypi_response(content):
+    """Like `parse_pypi_json`, but for the raw body, so the JSON is decoded in the
+    parse pool as well."""
+    return parse_pypi_json(json.loads(content))
+
+
+class PyPIJSONSource:
+    """Gets metadata from the PyPI JSON API."""
+
+    def __init__(self, fetcher):
+        self.fetcher = fetcher
+
+    async def get(self, package):
+        async def parse(response):
+            if response.status_code == 404:
+                return None
+            elif response.status_code != 200:
+                raise RuntimeError(
+                    f"Couldn't get PyPI metadata, status code {response.status_code} for package: {package}"
+                )
+            return await self.fetcher.parse(parse_pypi_response, response.content)
+
+        return await self.fetcher.get_parsed(
+            f"https://pypi.org/pypi/{package}/json", parse
+        )
+
+
+class PyPIDumpSource:
+    """Gets metadata from a local JSON lines file, where each line is a response of the
+    PyPI JSON API."""
+
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+
+    def _load(self):
+        self._data = {}
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    data = json.loads(line)
+                    self._data[normalize(data["info"]["name"])] = data
+
+    async def get(self, package):
+        if self._data is None:
+            self._load()
+        data = self._data.get(normalize(package))
+        return parse_pypi_json(data) if data is not None else None
@@ -0,0 +1,178 @@
+"""Persistent state of the crawler, so refreshes only re-parse what changed.
+
+For every URL, `CrawlState` stores the ETag, Last-Modified header, a hash of the
+content, and the parsed result. `fetch.Fetcher.get_parsed` uses it to send conditional
+requests and to skip parsing if the content didn't change. It also stores the components
+of the last run, so we can log which components were added, removed or changed and
+keep fields that aren't due for a refresh (see `scheduler.py`), and the Github repo of
+each package (see `repos.py`).
+"""
+
+import dataclasses
+import json
+import pickle
+import sqlite3
+import time
+from datetime import datetime
+
+
+@dataclasses.dataclass
+class Resource:
+    url: str
+    status_code: int
+    etag: str
+    last_modified: str
+    content_hash: str
+    parsed: object
+    fetched_at: float
+
+
+class CrawlState:
+    def __init__(self, path="crawl_state.db"):
+        self.path = path
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS resources (
+                url TEXT PRIMARY KEY,
+                status_code INTEGER,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                parsed BLOB,
+                fetched_at REAL
+            )""")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS components (key TEXT PRIMARY KEY, data BLOB)"
+        )
+        # Github repo of each package, repo is NULL if there's none.
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS repos (package TEXT PRIMARY KEY, repo TEXT, checked_at REAL)"
+        )
+        # When each group of fields of each component was refreshed (see scheduler.py).
+        self._db.execute("""CREATE TABLE IF NOT EXISTS refreshed (
+                key TEXT,
+                field_group TEXT,
+                refreshed_at REAL,
+                PRIMARY KEY (key, field_group)
+            )""")
+
+    def close(self):
+        self._db.close()
+
+    def get(self, url):
+        row = self._db.execute(
+            "SELECT url, status_code, etag, last_modified, content_hash, parsed, fetched_at FROM resources WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        row = list(row)
+        row[5] = pickle.loads(row[5])
+        return Resource(*row)
+
+    def put(self, url, status_code, etag, last_modified, content_hash, parsed):
+        self._db.execute(
+            "INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                url,
+                status_code,
+                etag,
+                last_modified,
+                content_hash,
+                pickle.dumps(parsed),
+                time.time(),
+            ),
+        )
+
+    def touch(self, url):
+        """Marks a resource as checked right now (e.g. after a 304)."""
+        self._db.execute(
+            "UPDATE resources SET fetched_at = ? WHERE url = ?", (time.time(), url)
+        )
+
+    def get_repos(self):
+        """Returns a dict from package to (repo URL or None, time it was checked)."""
+        return {
+            package: (repo, checked_at)
+            for package, repo, checked_at in self._db.execute(
+                "SELECT package, repo, checked_at FROM repos"
+            )
+        }
+
+    def put_repos(self, repos):
+        """Stores the repo URL (or None) for each package in a dict."""
+        now = time.time()
+        self._db.executemany(
+            "INSERT OR REPLACE INTO repos VALUES (?, ?, ?)",
+            [(package, repo, now) for package, repo in repos.items()],
+        )
+
+    def get_refreshed(self):
+        """Returns a dict from (component key, field group) to the time it was
+        refreshed."""
+        return {
+            (key, group): refreshed_at
+            for key, group, refreshed_at in self._db.execute(
+                "SELECT key, field_group, refreshed_at FROM refreshed"
+            )
+        }
+
+    def put_refreshed(self, pairs, refreshed_at):
+        """Stores the refresh time for a list of (component key, field group) tuples."""
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO refreshed VALUES (?, ?, ?)",
+                [(key, group, refreshed_at) for key, group in pairs],
+            )
+
+    def load_components(self):
+        """Returns the components of the last run as a dict from key to component."""
+        return {
+            key: pickle.loads(data)
+            for key, data in self._db.execute("SELECT key, data FROM components")
+        }
+
+    def save_components(self, components):
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM components")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO components VALUES (?, ?)",
+                [(component_key(c), pickle.dumps(c)) for c in components],
+            )
+
+
+def component_key(c):
+    return c.package or c.name
+
+
+def diff_components(old, new):
+    """Compares the components of the last run (dict from key to component) with a new
+    list of components.
+
+    Returns a dict with the keys of added and removed components, and for each changed
+    component the names of the fields that changed.
+    """
+    new = {component_key(c): c for c in new}
+    changed = {}
+    for key in old.keys() & new.keys():
+        fields = [
+            f.name
+            for f in dataclasses.fields(new[key])
+            if getattr(old[key], f.name, None) != getattr(new[key], f.name)
+        ]
+        if fields:
+            changed[key] = fields
+    return {
+        "added": sorted(new.keys() - old.keys()),
+        "removed": sorted(old.keys() - new.keys()),
+        "changed": dict(sorted(changed.items())),
+    }
+
+
+def log_changes(changes, path):
+    """Appends the changes of a run to a JSON lines file."""
+    with open(path, "a") as f:
+        f.write(json.dumps({"time": datetime.now().isoformat(), **changes}) + "\n")
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+import build_catalog
+import crawler
+from benchmarks import fixture_server
+from benchmarks.synthetic import make_components, package_name
+from catalog import CATALOG_VERSION, Catalog, list_snapshots, write_catalog
+from fetch import Fetcher
+from github import GraphQLSource
+from readme import parse_readme
+from sources import parse_author
+from refresh import RefreshWorker
+
+DAY = 24 * 3600
+
+# Raw READMEs and what Github shows for them: the first image that isn't a badge, the
+# first paragraph of text, and the first link to a Streamlit app.
+README_DIR = os.path.join(os.path.dirname(__file__), "test_readmes")
+with open(os.path.join(README_DIR, "expected.json")) as f:
+    EXPECTED_READMES = json.load(f)
+
+
+@pytest.fixture(scope="module")
+def origins():
+    server, origins = fixture_server.serve(packages=60)
+    yield origins
+    server.shutdown()
+
+
+def crawl(origins, tmp_path, **kwargs):
+    return crawler.get_components(
+        gh_token="x",
+        origins=origins,
+        rates={},
+        state_path=str(tmp_path / "state.db"),
+        changelog=str(tmp_path / "changes.jsonl"),
+        **kwargs,
+    )
+
+
+def test_crawl(origins, tmp_path):
+    fixtures = fixture_server.Fixtures()
+    components = {c.package: c for c in crawl(origins, tmp_path)}
+    assert sorted(components) == sorted(map(package_name, range(60)))
+    for package, c in components.items():
+        owner = fixtures.owner(package)
+        assert c.pypi == f"https://pypi.org/project/{package}/"
+        assert c.pypi_author == owner
+        assert c.downloads == 300
+        assert c.downloads_last_week == 70
+        assert c.downloads_last_day == 10
+        # Also for packages that don't link to their repo (guessed from the author).
+        assert c.github == f"https://github.com/{owner}/{package}"
+        repo = fixtures.repo(owner, package)
+        if repo is None:
+            assert c.stars is None and c.image_url is None
+            continue
+        assert c.stars == repo["stargazerCount"]
+        assert c.avatar == repo["owner"]["avatarUrl"]
+        assert c.image_url == f"{c.github}/raw/HEAD/demo.gif"
+        assert c.demo == f"https://share.streamlit.io/{owner}/{package}/main/app.py"
+        if repo["description"]:
+            assert c.github_description == repo["description"]
+
+
+def test_crawl_with_blocked_repo(tmp_path):
+    blocked = package_name(1)
+    server, origins = fixture_server.serve(packages=60, blocked=[blocked])
+    try:
+        components = {c.package: c for c in crawl(origins, tmp_path)}
+    finally:
+        server.shutdown()
+    # Neither GraphQL nor REST can get its README, the others are fine.
+    assert components[blocked].image_url is None
+    assert components[package_name(2)].image_url is not None
+
+
+def test_day_2_crawl_keeps_readme_descriptions(origins, tmp_path, monkeypatch):
+    first = {c.package: c for c in crawl(origins, tmp_path)}
+    # Repos without a Github description show the first paragraph of their README.
+    fixtures = fixture_server.Fixtures()
+    from_readme = [
+        c
+        for c in first.values()
+        if c.github
+        and c.github_description
+        and fixtures.repo(*c.github.split("/")[-2:])["description"] is None
+    ]
+    assert from_readme
+
+    # A day later, stars are due again but most READMEs aren't.
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + DAY)
+    second = crawl(origins, tmp_path)
+
+    for c in second:
+        assert c.github_description == first[c.package].github_description
+    with open(tmp_path / "changes.jsonl") as f:
+        changes = json.loads(f.readlines()[-1])
+    assert not any(
+        "github_description" in fields for fields in changes["changed"].values()
+    )
+
+
+def get_repos(repos, **fixture_kwargs):
+    server, origins = fixture_server.serve(packages=60, **fixture_kwargs)
+
+    async def get():
+        async with Fetcher(origins=origins, rates={}, backoff=0.01) as fetcher:
+            return await GraphQLSource(fetcher, "x").get_repos(repos)
+
+    try:
+        return asyncio.run(get())
+    finally:
+        server.shutdown()
+
+
+def test_graphql_errors_only_affect_their_repo():
+    fixtures = fixture_server.Fixtures()
+    ok, blocked, missing = [
+        (fixtures.owner(p), p) for p in map(package_name, [1, 2, 20])
+    ]
+    infos = get_repos([ok, blocked, missing], blocked=[blocked[1]])
+    assert infos[ok].stars == 1
+    assert blocked not in infos  # unknown, so it's tried again next time
+    assert infos[missing] is None
+
+
+def test_graphql_rate_limit_is_retried():
+    fixtures = fixture_server.Fixtures()
+    repo = (fixtures.owner(package_name(1)), package_name(1))
+    assert get_repos([repo], rate_limited=2)[repo].stars == 1
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED_READMES))
+def test_parse_readme(name):
+    with open(os.path.join(README_DIR, name)) as f:
+        text = f.read()
+    image_url, description, demo = parse_readme(text, "owner", "repo", name)
+    expected = EXPECTED_READMES[name]
+    assert image_url == expected["image_url"]
+    assert description == expected["description"]
+    assert demo == expected["demo"]
+
+
+def test_graphql_and_rest_agree(origins, tmp_path):
+    graphql = {c.package: c for c in crawl(origins, tmp_path)}
+    # Without a token, repos are fetched with one REST request each.
+    rest = crawler.get_components(origins=origins, rates={})
+    assert sorted(c.package for c in rest) == sorted(graphql)
+    for c in rest:
+        expected = graphql[c.package]
+        assert c.github == expected.github
+        assert c.stars == expected.stars
+        assert c.avatar == expected.avatar
+        assert c.created_at == expected.created_at
+
+
+def failing_crawl(before_failing=lambda: None):
+    """A crawl that publishes a partial snapshot and then fails."""
+
+    def get_components(publish, **kwargs):
+        publish(make_components(10))
+        before_failing()
+        raise RuntimeError("Crawl failed")
+
+    return get_components
+
+
+def test_failed_build_removes_partial_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(crawler, "get_components", failing_crawl())
+    with pytest.raises(RuntimeError):
+        build_catalog.build(snapshots=str(tmp_path))
+    assert list_snapshots(str(tmp_path)) == []
+
+
+def test_failed_refresh_goes_back_to_last_snapshot(tmp_path, monkeypatch):
+    old = str(tmp_path / f"catalog-v{CATALOG_VERSION}-20230101-000000.arrow")
+    write_catalog(make_components(20), old)
+    os.utime(old, (time.time() - 2 * DAY,) * 2)
+    worker = RefreshWorker(snapshots=str(tmp_path))
+    worker.load_newest()
+
+    def load_partial():
+        worker.load_newest()
+        assert worker.path != old
+
+    monkeypatch.setattr(crawler, "get_components", failing_crawl(load_partial))
+    with pytest.raises(RuntimeError):
+        worker.refresh()
+    assert worker.path == old
+    assert worker.age() > worker.max_age
+
+
+def test_failed_first_refresh_needs_refresh(tmp_path, monkeypatch):
+    worker = RefreshWorker(snapshots=str(tmp_path))
+    monkeypatch.setattr(crawler, "get_components", failing_crawl(worker.load_newest))
+    with pytest.raises(RuntimeError):
+        worker.refresh()
+    # The partial catalog is still shown, but it's refreshed again.
+    assert worker.catalog is not None
+    assert worker.age() is not None and worker.incomplete
+
+
+def test_failed_refresh_backs_off(tmp_path, monkeypatch):
+    worker = RefreshWorker(snapshots=str(tmp_path), retry_delay=60)
+    monkeypatch.setattr(crawler, "get_components", failing_crawl())
+    now = time.time()
+    for failures, delay in [(1, 60), (2, 120)]:
+        monkeypatch.setattr(time, "time", lambda: now)
+        with pytest.raises(RuntimeError):
+            worker.refresh()
+        assert worker.failures == failures
+        monkeypatch.setattr(time, "time", lambda: now + delay - 1)
+        assert not worker.is_due()
+        now += delay
+        monkeypatch.setattr(time, "time", lambda: now)
+        assert worker.is_due()
+
+
+@pytest.mark.parametrize(
+    "info, author",
+    [
+        ({"author": "jrieke", "author_email": "Jane Doe <jane@x.io>"}, "jrieke"),
+        ({"author": "UNKNOWN", "maintainer": "jrieke"}, "jrieke"),
+        ({"author": "", "author_email": "Jane Doe <jane@x.io>"}, "Jane Doe"),
+        ({"author_email": '"Doe, Jane" <jane@x.io>, Joe <joe@x.io>'}, "Doe, Jane"),
+        ({"author": None, "maintainer_email": "Joe <joe@x.io>"}, "Joe"),
+        ({"author_email": "jane@x.io"}, None),
+        ({}, None),
+    ],
+)
+def test_parse_author(info, author):
+    assert parse_author(info) == author
+
+
+@pytest.mark.parametrize("search", ["", " ", "-", "!"])
+def test_search_without_terms_shows_everything(search):
+    catalog = Catalog.from_components(make_components(20))
+    assert len(catalog.query("stars", search)) == 20
@@ -0,0 +1,70 @@
+"""Small local thumbnails of the README preview images.
+
+Preview images are often full-size screenshots or GIFs of several MB, but cards only
+show them 200 px high. During the crawl, each image is downloaded once and turned into
+a small WebP (the first frame for animations). Thumbnails are stored under their content
+hash, so the same image is only stored once and a file never changes once written.
+
+The app serves them with Streamlit's static file serving (see .streamlit/config.toml),
+i.e. files in `static/` are available at `app/static/`.
+"""
+
+import hashlib
+import io
+import os
+
+from PIL import Image, ImageOps
+
+THUMBNAIL_DIR = "static/thumbnails"
+THUMBNAIL_URL = "app/static/thumbnails"
+
+# Twice the size shown in the cards, so it's still sharp on high-DPI screens.
+MAX_SIZE = (800, 400)
+
+# What Pillow raises for files that aren't images it can read.
+INVALID_IMAGE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+
+
+def make_thumbnail(data, max_size=MAX_SIZE, quality=80):
+    """Returns a WebP thumbnail (as bytes) of an image, only the first frame of
+    animations."""
+    with Image.open(io.BytesIO(data)) as image:
+        image.seek(0)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        image.thumbnail(max_size)
+        out = io.BytesIO()
+        image.save(out, "WEBP", quality=quality, method=4)
+    return out.getvalue()
+
+
+class ThumbnailStore:
+    def __init__(self, directory=THUMBNAIL_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def name(self, data):
+        """Returns the file name of the thumbnail of an image."""
+        return hashlib.sha256(data).hexdigest()[:32] + ".webp"
+
+    def write(self, name, thumbnail):
+        tmp_path = self.path(name) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(thumbnail)
+        os.replace(tmp_path, self.path(name))
+
+    def prune(self, used):
+        """Removes all thumbnails whose names are not in `used`."""
+        for name in os.listdir(self.directory):
+            if name.endswith(".webp") and name not in used:
+                os.remove(self.path(name))
+
+
+def thumbnail_url(name):
+    return f"{THUMBNAIL_URL}/{name}"